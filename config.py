@@ -18,7 +18,10 @@ class Config:
     SECRET_KEY_SALT = base64.b64decode(bytes(os.environ.get('SECRET_KEY_SALT'), "utf-8"))
     FLASK_ADMIN_FLUID_LAYOUT = True
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(basedir, 'instance', 'jbod.db')}"
+    # compiled statement cache; sized above the 500 default for the admin views + scheduler jobs
+    SQLALCHEMY_ENGINE_OPTIONS = {'query_cache_size': 1200}
     SERIAL_DEBUG_FILE = os.path.join(basedir, 'instance', 'serial.log')
+    SERIAL_CPU_AFFINITY = os.environ.get('SERIAL_CPU_AFFINITY')  # optional core for console threads
     UPLOAD_FOLDER = os.path.join(basedir, 'instance', 'uploads')
     MAX_CONTENT_LENGTH = 2 * 1000 * 1000  # 2 megabytes
     SCHEDULER_JOBS = []  # APScheduler Jobs
@@ -18,7 +18,8 @@ setup(
         'cryptography',
         'sqlalchemy',
         'wtforms',
-        'python-dotenv'
+        'python-dotenv',
+        'msgspec'
     ],
 )
 
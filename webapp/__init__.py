@@ -1,9 +1,13 @@
+import atexit
 import logging
 import os
 import base64
+import functools
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask
 from flask.logging import default_handler
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from sqlalchemy.exc import IntegrityError
 from flask_admin import Admin
 from cryptography.fernet import Fernet
@@ -45,21 +49,36 @@ def setup_flask_admin(app_instance, session):
 
 
 def setup_logger(file_path: str, app_instance: Flask, level: int):
-    if not os.path.exists(file_path):
-        if file_path.endswith(('/', '\\')):
-            os.mkdir(file_path)
-            file_path = os.path.normpath(os.path.join(file_path, 'ipmi.log'))
-        else:
-            file_path = os.path.normpath(file_path)
+    if file_path.endswith(('/', '\\')):
+        os.makedirs(file_path, exist_ok=True)
+        file_path = os.path.join(file_path, 'ipmi.log')
+    file_path = os.path.normpath(file_path)
     file_handler = RotatingFileHandler(filename=file_path, mode='a', maxBytes=100000, backupCount=0)
     file_handler.setLevel(level)
     file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    for logger in (app_instance.logger, logging.getLogger('apscheduler_jobs'), logging.getLogger('apscheduler_events')):
+    for logger in (app_instance.logger, logging.getLogger('apscheduler_jobs'), logging.getLogger('apscheduler_events'),
+                   logging.getLogger('jbod_console')):
         logger.setLevel(level)
         logger.addHandler(file_handler)
         logger.addHandler(default_handler)
 
 
+@functools.lru_cache(maxsize=None)
+def jinja_globals() -> dict:
+    """Custom jinja functions; built once per process"""
+    from webapp import jobs, utils
+
+    return {
+        'truenas_connection_info': jobs.truenas_connection_info,
+        'get_serial_connection': jobs.console_connection_check,
+        'disk_tooltip_html': utils.disk_tooltip_html,
+        'svg_html_converter': utils.svg_html_converter,
+        'get_alerts': utils.get_alerts,
+        'fan_watchdog': utils.fan_watchdog,
+        'fan_tooltip_html': utils.fan_tooltip_html,
+    }
+
+
 def generate_key(salt, token) -> Fernet:
     if not isinstance(salt, bytes):
         salt = salt.encode()
@@ -82,35 +101,58 @@ def create_app(debug=False):
 
     # create a .env if one doesn't already exist
     basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-    if not os.path.exists(os.path.join(basedir, '.env')):
-        with open(os.path.join(basedir, '.env'), 'w') as f:
+    try:
+        with open(os.path.join(basedir, '.env'), 'x') as f:
             f.write(f"SECRET_KEY={Fernet.generate_key().decode()}\n")
             f.write(f"SECRET_KEY_SALT={base64.b64encode(os.urandom(16)).decode()}\n")
+    except FileExistsError:
+        pass
 
     if not debug:
         app.config.from_object('config.ProdConfig')
     else:
         app.config.from_object('config.DevConfig')
     # ensure the instance folder exists
-    try:
-        os.makedirs(app.instance_path)
-    except OSError:
-        pass
+    os.makedirs(app.instance_path, exist_ok=True)
 
     from webapp import jobs
-    from webapp.models import db, SysConfig, SysJob, Alert
+    from webapp.models import db, SysConfig, SysJob, Alert, ComStat
     from webapp import utils
 
     # initialize flask addons
     db.init_app(app)
 
+    # derive the encryption key (PBKDF2) in a worker thread while the database is bootstrapped
+    key_executor = ThreadPoolExecutor(max_workers=1)
+    key_future = key_executor.submit(generate_key, app.config['SECRET_KEY'], app.config['SECRET_KEY_SALT'])
+    key_executor.shutdown(wait=False)
+
     with app.app_context():
         # create an upload directory if it doesn't exist already
-        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-            os.mkdir(app.config['UPLOAD_FOLDER'])
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         # Create the database if it doesn't already exist
         if not os.path.exists(app.config['SQLALCHEMY_DATABASE_URI']):
             db.create_all()
+            # older databases can hold several com_stat rows per day; merge them so the unique index can be built
+            dupe_dates = db.session.query(ComStat.stat_date) \
+                .group_by(ComStat.stat_date) \
+                .having(db.func.count(ComStat.id) > 1) \
+                .all()
+            for (stat_date,) in dupe_dates:
+                keep, *dupes = db.session.query(ComStat) \
+                    .where(ComStat.stat_date == stat_date) \
+                    .order_by(ComStat.id) \
+                    .all()
+                for dupe in dupes:
+                    keep.rx = (keep.rx or 0) + (dupe.rx or 0)
+                    keep.tx = (keep.tx or 0) + (dupe.tx or 0)
+                    keep.err = (keep.err or 0) + (dupe.err or 0)
+                    db.session.delete(dupe)
+            db.session.commit()
+            # create_all only builds indexes with new tables; add any missing ones to existing tables
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(db.engine, checkfirst=True)
             for k, v in config_defaults.items():
                 try:
                     if k.endswith('_key'):
@@ -133,12 +175,20 @@ def create_app(debug=False):
         if not log_path:
             log_path = os.path.normpath(os.path.join(app.instance_path, 'jbod.log'))
         setup_logger(file_path=log_path, app_instance=app, level=app.config['LOGGING_LEVEL'])
-        alert_handler = utils.AlertLogHandler(alert_model=Alert, app_context=app, db_session=db.session)
-        alert_handler.setLevel(logging.WARNING)  # prevent overflow of alerts
-        app.logger.addHandler(alert_handler)
+        # alerts are written to the db by a listener thread; logging calls only enqueue the record
+        alert_queue = queue.SimpleQueue()
+        alert_handler = utils.AlertLogHandler(alert_model=Alert, app_context=app, db_session=db.session,
+                                              alert_queue=alert_queue)
+        alert_listener = QueueListener(alert_queue, alert_handler)
+        alert_listener.start()
+        atexit.register(alert_handler.flush)  # atexit is LIFO; writes whatever stop() left buffered
+        atexit.register(alert_listener.stop)
+        alert_queue_handler = QueueHandler(alert_queue)
+        alert_queue_handler.setLevel(logging.WARNING)  # prevent overflow of alerts
+        app.logger.addHandler(alert_queue_handler)
 
         # setup encrypt & decrypt methods in app instance
-        _ceph = generate_key(app.config['SECRET_KEY'], app.config['SECRET_KEY_SALT'])
+        _ceph = key_future.result()
         app.__setattr__('encrypt', _ceph.encrypt)
         app.__setattr__('decrypt', _ceph.decrypt)
 
@@ -148,7 +198,7 @@ def create_app(debug=False):
             app.config['SCHEDULER_JOBS'].append(job.job_dict)
 
         # turn on 'always-on' jobs
-        for cfg in config.scheduler_jobs:
+        for cfg in scheduler_jobs:
             if cfg.get('active', None):
                 jobs.activate_sys_job(cfg.get('job_id'))
 
@@ -162,6 +212,9 @@ def create_app(debug=False):
         jobs.get_console()
 
     app = setup_flask_admin(app, db.session)
+    # flask_apscheduler reads its settings in init_app
+    app.config['SCHEDULER_JOB_DEFAULTS'] = scheduler_job_defaults
+    app.config['SCHEDULER_EXECUTORS'] = {'default': {'type': 'threadpool', 'max_workers': max(4, os.cpu_count() or 1)}}
     jobs.scheduler.init_app(app)
 
     # setup apscheduler and event listeners
@@ -171,17 +224,11 @@ def create_app(debug=False):
     jobs.scheduler.add_listener(jobs.ev.job_added_listener, EVENT_JOB_ADDED)
     jobs.scheduler.add_listener(jobs.ev.job_removed_listener, EVENT_JOB_REMOVED)
     jobs.scheduler.add_listener(jobs.ev.job_submitted_listener, EVENT_JOB_SUBMITTED)
-    app.config['SCHEDULER_JOB_DEFAULTS'] = scheduler_job_defaults
     jobs.scheduler.start()
 
     # add custom functions to jinja environment
-    app.jinja_env.globals.update(**dict(
-        truenas_connection_info=jobs.truenas_connection_info,
-        get_serial_connection=jobs.console_connection_check,
-        disk_tooltip_html=utils.disk_tooltip_html,
-        svg_html_converter=utils.svg_html_converter,
-        get_alerts=utils.get_alerts,
-        fan_watchdog=utils.fan_watchdog,
-        fan_tooltip_html=utils.fan_tooltip_html
-    ))
+    app.jinja_env.globals.update(jinja_globals())
+    if debug:
+        # svgs are cached like compiled templates; re-read them every request while developing
+        app.before_request(utils.clear_svg_cache)
     return app
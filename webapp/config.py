@@ -2,10 +2,13 @@
 # Webapp Configurations
 #
 
+from dataclasses import dataclass, asdict
+from types import MappingProxyType
+
 DEFAULT_FAN_PWM = 50
 
 # configuration defaults
-config_defaults = {
+config_defaults = MappingProxyType({
     'timezone': 'America/Chicago',
     'console_port': None,
     'baud_rate': '115600',
@@ -30,59 +33,76 @@ config_defaults = {
     'job_paused_minutes': 60,
     'http_requests_timeout': 15,
     'fan_alert_after_seconds': 120
-}
+})
 
-scheduler_job_defaults = {
+scheduler_job_defaults = MappingProxyType({
     'coalesce': True,
     'max_instances': 1,
-    'misfire_grace_time': 1
-}
+    'misfire_grace_time': 30
+})
+
+
+@dataclass(frozen=True, slots=True)
+class JobSpec:
+    """Default definition of a system job; mirrors the SysJob columns"""
+    job_id: str
+    func: str
+    job_name: str
+    description: str
+    seconds: int = 0
+    minutes: int = 0
+    hours: int = 0
+    can_edit: bool = True  # prevents user from being able to change times if False
+    active: bool = False  # 'always-on' jobs are activated on startup
+
 
 # task scheduler defaults
-scheduler_jobs = [
-    {
-        'job_id': 'query_disk_properties',
-        'func': 'webapp.jobs:query_disk_properties',
-        'job_name': 'Query Disk Properties',
-        'description': 'TrueNAS API call to get disk properties.',
-        'hours': 1,
-        'can_edit': True,
-    }, {
-        'job_id': 'query_disk_temperatures',
-        'func': 'webapp.jobs:query_disk_temperatures',
-        'job_name': 'Query Disk Temperatures',
-        'description': 'TrueNAS API call to get disk temperatures.',
-        'minutes': 1,
-        'can_edit': True
-    }, {
-        'job_id': 'poll_setpoints',
-        'func': 'webapp.jobs:poll_setpoints',
-        'job_name': 'Poll Fan Setpoints',
-        'description': 'Poll chassis temperature and set fan(s) PWM according to defined setpoint.',
-        'minutes': 2,
-        'can_edit': True
-    }, {
-        'job_id': 'poll_controller_data',
-        'func': 'webapp.jobs:poll_controller_data',
-        'job_name': 'Poll Controller Data',
-        'description': 'Poll controller(s) to get latest fan RPM and PWM, as well as PSU Status.',
-        'seconds': 30,
-        'can_edit': True
-    }, {
-        'job_id': 'database_cleanup',
-        'func': 'webapp.jobs:database_cleanup',
-        'job_name': 'Database Cleanup',
-        'description': 'Removes old data from database',
-        'hours': 2,
-        'can_edit': True
-    },
-    {
-        'job_id': 'tty_stat_tracker',
-        'func': 'webapp.jobs:tty_stat_tracker',
-        'job_name': 'Stat Tracker',
-        'description': 'Stores Tx/Rx byte counts',
-        'hours': 1,
-        'can_edit': False,  # prevents user from being able to change times
-        'active': True
-    }
-]
\ No newline at end of file
+SCHEDULER_JOBS = (
+    JobSpec(
+        job_id='query_disk_properties',
+        func='webapp.jobs:query_disk_properties',
+        job_name='Query Disk Properties',
+        description='TrueNAS API call to get disk properties.',
+        hours=1,
+    ),
+    JobSpec(
+        job_id='query_disk_temperatures',
+        func='webapp.jobs:query_disk_temperatures',
+        job_name='Query Disk Temperatures',
+        description='TrueNAS API call to get disk temperatures.',
+        minutes=1,
+    ),
+    JobSpec(
+        job_id='poll_setpoints',
+        func='webapp.jobs:poll_setpoints',
+        job_name='Poll Fan Setpoints',
+        description='Poll chassis temperature and set fan(s) PWM according to defined setpoint.',
+        minutes=2,
+    ),
+    JobSpec(
+        job_id='poll_controller_data',
+        func='webapp.jobs:poll_controller_data',
+        job_name='Poll Controller Data',
+        description='Poll controller(s) to get latest fan RPM and PWM, as well as PSU Status.',
+        seconds=30,
+    ),
+    JobSpec(
+        job_id='database_cleanup',
+        func='webapp.jobs:database_cleanup',
+        job_name='Database Cleanup',
+        description='Removes old data from database',
+        hours=2,
+    ),
+    JobSpec(
+        job_id='tty_stat_tracker',
+        func='webapp.jobs:tty_stat_tracker',
+        job_name='Stat Tracker',
+        description='Stores Tx/Rx byte counts',
+        hours=1,
+        can_edit=False,
+        active=True,
+    ),
+)
+
+# read-only dict views of SCHEDULER_JOBS; used to seed SysJob rows
+scheduler_jobs = tuple(MappingProxyType(asdict(j)) for j in SCHEDULER_JOBS)
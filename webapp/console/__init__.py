@@ -1,10 +1,17 @@
+import logging
+import os
 import threading
+import queue
+import msgspec
 import serial
+from collections import deque
 from typing import Optional, Union
 import time
 from enum import Enum
 import re
 
+_logger = logging.getLogger('jbod_console')
+
 
 class JBODConsoleException(Exception):
     pass
@@ -86,11 +93,31 @@ class JBODControlCharacter(Enum):
     DC4 = "\x14"  # Device Control 4
 
 
+class DC2Data(msgspec.Struct):
+    psu: str
+    rpm: list[int]
+    pwm: list[int]
+
+
+class DC2Message(msgspec.Struct):
+    """
+    Controller data broadcast sent in response to DC2;
+    {"mcu": ..., "data": {"psu": ..., "rpm": [...], "pwm": [...]}}
+    """
+    mcu: str
+    data: DC2Data
+
+
+# compiled once for the fixed DC2 schema; strict=False accepts numbers sent as strings
+dc2_decoder = msgspec.json.Decoder(DC2Message, strict=False)
+
+
 class JBODRxData:
     ENCODING = "ASCII"
 
     def __init__(self, data: bytes):
         self.raw_data = data
+        self.payload = b''  # message body bytes, without control character and terminators
         self._data = None
         self.cc_mapper = {
             str(JBODControlCharacter.ACK.value).encode(self.ENCODING): False,
@@ -134,19 +161,19 @@ class JBODRxData:
         return self._data
 
     @data.setter
-    def data(self, val: Union[bytearray, str]):
-        """Automatically decoded to ASCII"""
-        if isinstance(val, bytearray):
-            self._data = val.decode(self.ENCODING)
-        else:
-            self._data = val
+    def data(self, val: Optional[str]):
+        self._data = val
 
     def _parse_data(self, data: bytes):
-        """First character defines message type; followed by message"""
+        """
+        First character defines message type; followed by message.
+        Message body is decoded to ASCII once here.
+        """
         for ctrlc in self.cc_mapper.keys():
-            if bytearray(data).startswith(ctrlc):
+            if data.startswith(ctrlc):
                 self.set_flag(ctrlc)
-                self.data = bytearray(data).removeprefix(ctrlc).strip(b'\r\n\x00')
+                self.payload = data[len(ctrlc):].strip(b'\r\n\x00')
+                self._data = self.payload.decode(self.ENCODING, errors='replace')
                 break
 
     def __repr__(self):
@@ -154,27 +181,50 @@ class JBODRxData:
                f"dc4={self.dc4},data={self.data},raw_data={self.raw_data})"
 
 
+class JBODFramer:
+    """
+    Accumulates received bytes and splits them into terminated frames
+    """
+
+    def __init__(self, terminator: bytes):
+        self.terminator = terminator
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """Adds data to the buffer; returns all complete frames (terminator included)"""
+        self._buffer.extend(data)
+        if self.terminator not in self._buffer:
+            return []
+        *frames, self._buffer = self._buffer.split(self.terminator)
+        frames = [f.strip(b'\x00') for f in frames]
+        return [bytes(f) + self.terminator for f in frames if f]
+
+    def clear(self):
+        self._buffer = bytearray()
+
+
 class JBODConsole:
     TERMINATOR = b'\r\n'
     ENCODING = 'ASCII'
     NEW_RX_DATA = False
-    NEW_TX_DATA = False
+    RESPONSE_QUIET_SECS = 0.3  # line is considered quiet after this long without a response
 
-    def __init__(self, serial_instance: serial.Serial, callback: Optional[callable] = None, **kwargs):
+    def __init__(self, serial_instance: serial.Serial, callback: Optional[callable] = None,
+                 cpu_affinity: Optional[int] = None, **kwargs):
         self.cmd = JBODCommand
         self.ctrlc = JBODControlCharacter
         self.serial = serial_instance
         self.alive = False
-        self.rx_backlog = False
         self.receiver_thread = None
         self.transmitter_thread = None
         self._reader_alive = False
-        self._rx_buffer = None
-        self._tx_buffer = None
+        self._rx_buffer = deque()  # FIFO of ack/nak responses
+        self._tx_queue = queue.SimpleQueue()  # frames waiting on the writer thread
         self._callback = callback
-        self._data_received = bytearray()
+        self._framer = JBODFramer(self.TERMINATOR)
         self._lock = threading.Lock()
         self._callback_kwargs = kwargs
+        self.cpu_affinity = cpu_affinity  # core the rx/tx threads are pinned to
 
         # trackers
         self.bytes_recv = 0
@@ -205,6 +255,31 @@ class JBODConsole:
         self.transmitter_thread = threading.Thread(target=self.writer, name='tx')
         self.transmitter_thread.daemon = True
         self.transmitter_thread.start()
+        self._tune_latency()
+
+    def _tune_latency(self):
+        """
+        Best effort (linux only): asks the tty driver for low latency reads
+        (FTDI latency timer 16ms -> 1ms) and pins the worker threads to cpu_affinity.
+        """
+        # posix pyserial only; url handlers (loop://, rfc2217://, ...) don't have it
+        if hasattr(self.serial, 'set_low_latency_mode'):
+            try:
+                self.serial.set_low_latency_mode(True)
+            except (OSError, ValueError, serial.SerialException) as err:
+                _logger.debug(f"Low latency mode not supported by serial driver: {err}")
+        if self.cpu_affinity is not None and hasattr(os, 'sched_setaffinity'):
+            try:
+                cpus = {int(self.cpu_affinity)}
+            except (TypeError, ValueError):
+                _logger.warning(f"Invalid SERIAL_CPU_AFFINITY {self.cpu_affinity!r}; expected a cpu number. "
+                                f"Console threads are not pinned.")
+                return
+            for thread in (self.receiver_thread, self.transmitter_thread):
+                try:
+                    os.sched_setaffinity(thread.native_id, cpus)
+                except OSError as err:
+                    _logger.warning(f"Unable to pin console thread {thread.name} to cpu {self.cpu_affinity}: {err}")
 
     def stop(self):
         """set flag to stop worker threads"""
@@ -228,35 +303,17 @@ class JBODConsole:
             while self.alive and self._reader_alive:
                 # read all that is there or wait for one byte
                 data = self.serial.read(self.serial.in_waiting or 1)
-                # process if new data or existing terminated msg(s) backlogged
-                if data or self.rx_backlog:
-                    if data:
-                        self.bytes_recv += len(data)
-                        self._data_received.extend(data)
-                    if self.TERMINATOR in self._data_received:
-                        # Could have backlog of RX messages when reading;
-                        # process each separately
-                        ops = list(filter(None, [o for o in self._data_received.strip(b'\x00').split(self.TERMINATOR)]))
-                        if self._data_received.count(self.TERMINATOR) > 1:
-                            # process the first and send the rest to backlog
-                            rx = JBODRxData(bytes(ops[0] + self.TERMINATOR))
-                            if self._data_received.endswith(self.TERMINATOR):
-                                self._data_received = bytearray(self.TERMINATOR.join(ops[1:]) + self.TERMINATOR)
-                            else:
-                                self._data_received = bytearray(self.TERMINATOR.join(ops[1:]))
-                            self.rx_backlog = True
-                        else:
-                            rx = JBODRxData(bytes(ops[0] + self.TERMINATOR))
-                            try:
-                                self._data_received = bytearray(ops[1])
-                            except IndexError:
-                                self._data_received = bytearray()
-                            self.rx_backlog = False
-                        if rx.ack or rx.nak:
-                            self.rx_buffer = rx
-                        elif self._callback:
-                            self._callback(self, rx, **self._callback_kwargs)
-                time.sleep(0.1)
+                if not data:
+                    time.sleep(0.1)
+                    continue
+                self.bytes_recv += len(data)
+                # chunk may hold several (or partial) messages; process every complete one now
+                for frame in self._framer.feed(data):
+                    rx = JBODRxData(frame)
+                    if rx.ack or rx.nak:
+                        self.rx_buffer = rx
+                    elif self._callback:
+                        self._callback(self, rx, **self._callback_kwargs)
         except serial.SerialException as err:
             self.alive = False
             raise err
@@ -265,12 +322,13 @@ class JBODConsole:
         """loop write (thread safe)"""
         try:
             while self.alive:
-                if self.NEW_TX_DATA:
-                    with self._lock:
-                        self.serial.write(self.tx_buffer)
-                        self.bytes_trans += len(self.tx_buffer)
-                    self.tx_buffer = None  # clear buffer once transmitted
-                time.sleep(0.1)
+                try:
+                    data = self._tx_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                with self._lock:
+                    self.serial.write(data)
+                    self.bytes_trans += len(data)
         except Exception as err:
             self.alive = False
             raise err
@@ -291,18 +349,21 @@ class JBODConsole:
                 cmd = cmd.replace("?", str(i), 1)
         return cmd
 
-    def command_write(self, command: Union[JBODCommand, JBODControlCharacter], *args) -> JBODRxData:
-        """Blocking write command and return JBODRxData"""
-        # self.flush_buffers()
+    def _command_frame(self, command: Union[JBODCommand, JBODControlCharacter], args: tuple) -> tuple[str, bytes]:
+        """Returns the formatted command string and its terminated byte frame"""
         if isinstance(command, JBODCommand):
             fmt_command = self._command_format(command, tuple(args) if args else None)
         else:
             fmt_command = command.value
-        b = bytearray(str(fmt_command), self.ENCODING)  # convert str to bytearray
-        b.extend(self.TERMINATOR)  # add terminator to end of bytearray
+        return fmt_command, str(fmt_command).encode(self.ENCODING) + self.TERMINATOR
+
+    def command_write(self, command: Union[JBODCommand, JBODControlCharacter], *args) -> JBODRxData:
+        """Blocking write command and return JBODRxData"""
+        fmt_command, frame = self._command_frame(command, args)
         with self._lock:
-            self.bytes_trans += len(b)
-            self.serial.write(bytes(b))  # convert bytearray to bytes
+            self._rx_buffer.clear()  # drop stale responses
+            self.bytes_trans += len(frame)
+            self.serial.write(frame)
             resp = self.receive_now()
         if not resp.ack:
             raise JBODConsoleAckException(
@@ -312,59 +373,131 @@ class JBODConsole:
             )
         return resp
 
+    def command_write_many(self, commands: list) -> list[JBODRxData]:
+        """
+        Blocking write of several commands in a single serial write.
+        Each item is either a command or a tuple of (command, *args).
+        Responses are returned in the same order as the commands.
+        """
+        if not commands:
+            return []
+        frames = self._command_frames(commands)
+        payload = b''.join(frame for _, frame, _ in frames)
+        with self._lock:
+            self._rx_buffer.clear()  # drop stale responses
+            self.bytes_trans += len(payload)
+            self.serial.write(payload)
+            responses = []
+            try:
+                for _ in frames:
+                    responses.append(self.receive_now())
+            except JBODConsoleTimeoutException:
+                # replies to the remaining frames may still arrive; don't leave them for the next command
+                self._drain_responses(len(frames) - len(responses))
+                raise
+        for (fmt_command, _, args), resp in zip(frames, responses):
+            if not resp.ack:
+                raise JBODConsoleAckException(
+                    command_req=fmt_command,
+                    command_args=args,
+                    response=resp.raw_data
+                )
+        return responses
+
+    def command_write_burst(self, commands: list, stop_on_nak: bool = True) -> list[JBODRxData]:
+        """
+        Blocking write of several commands in a single serial write, collecting responses until
+        one times out (or NAKs when stop_on_nak). Used for probing where the reply count is unknown.
+        @return: responses received, in command order
+        """
+        if not commands:
+            return []
+        frames = self._command_frames(commands)
+        payload = b''.join(frame for _, frame, _ in frames)
+        responses = []
+        with self._lock:
+            self._rx_buffer.clear()  # drop stale responses
+            self.bytes_trans += len(payload)
+            self.serial.write(payload)
+            received = 0
+            for _ in frames:
+                try:
+                    resp = self.receive_now()
+                except JBODConsoleTimeoutException:
+                    break
+                received += 1
+                if stop_on_nak and not resp.ack:
+                    break
+                responses.append(resp)
+            # replies to probes after the stop are not wanted; wait them out while still holding the lock
+            self._drain_responses(len(frames) - received)
+        return responses
+
+    def _drain_responses(self, pending: int) -> None:
+        """
+        Discards up to pending late responses, returning early once the line has been quiet
+        for RESPONSE_QUIET_SECS. Must be called with _lock held.
+        """
+        deadline = time.monotonic() + self.RESPONSE_QUIET_SECS
+        while pending > 0 and time.monotonic() < deadline:
+            if self._rx_buffer:
+                self._rx_buffer.popleft()
+                pending -= 1
+                deadline = time.monotonic() + self.RESPONSE_QUIET_SECS
+            else:
+                time.sleep(0.01)
+        self.rx_buffer = None
+
+    def _command_frames(self, commands: list) -> list[tuple[str, bytes, list]]:
+        """Returns (formatted command, frame, args) for each command or (command, *args) tuple"""
+        frames = []
+        for item in commands:
+            command, *args = item if isinstance(item, tuple) else (item,)
+            frames.append((*self._command_frame(command, args), args))
+        return frames
+
     def flush_buffers(self):
-        self._data_received = bytearray()
+        self._framer.clear()
         self.rx_buffer = None
-        self.tx_buffer = None
+        # drop queued writes
+        while not self._tx_queue.empty():
+            self._tx_queue.get_nowait()
 
     @property
     def rx_buffer(self) -> Optional[JBODRxData]:
         """
-        Getter clears buffer and sets flag on read.
+        Getter pops the oldest response and updates flag on read.
         @return: buffer
         """
-        if self._rx_buffer:
-            self.NEW_RX_DATA = False
-            return self._rx_buffer
-        return None
+        try:
+            data = self._rx_buffer.popleft()
+        except IndexError:
+            return None
+        self.NEW_RX_DATA = bool(self._rx_buffer)
+        return data
 
     @rx_buffer.setter
     def rx_buffer(self, data: Optional[JBODRxData]):
-        # set to flag to false if None
+        # None clears all queued responses
         if not data:
-            self.NEW_RX_DATA = False
+            self._rx_buffer.clear()
         else:
-            self.NEW_RX_DATA = True
-        self._rx_buffer = data
+            self._rx_buffer.append(data)
+        self.NEW_RX_DATA = bool(self._rx_buffer)
 
     def receive_now(self):
         """Blocking wait for receive"""
         retries = 0
-        # wait for new data (0.5 sec max)
-        if self.NEW_RX_DATA:
+        # wait for new data (1 sec max)
+        if self._rx_buffer:
             return self.rx_buffer
         while retries < 10:
             time.sleep(0.1)
-            if self.NEW_RX_DATA:
+            if self._rx_buffer:
                 return self.rx_buffer
             retries += 1
         raise JBODConsoleTimeoutException("JBODConsole receive_now timed out.")
 
-    @property
-    def tx_buffer(self):
-        if self._tx_buffer:
-            self.NEW_TX_DATA = False
-            return self._tx_buffer
-        return None
-
-    @tx_buffer.setter
-    def tx_buffer(self, data: Optional[bytes]):
-        if not data:
-            self.NEW_TX_DATA = False
-        else:
-            self.NEW_TX_DATA = True
-        self._tx_buffer = data
-
     @property
     def callback(self) -> Optional[callable]:
         return self._callback
@@ -378,11 +511,15 @@ class JBODConsole:
         Non-blocking thread-safe write. Responses should be
         handled by callback.
         """
+        self.transmit_nowait(data)
+
+    def transmit_nowait(self, data: Union[bytes, JBODControlCharacter]) -> None:
+        """Queues data for the writer thread and returns immediately"""
         # Handle JBODCommands too?
         if isinstance(data, JBODControlCharacter):
-            self.tx_buffer = data.value.encode(self.ENCODING)
-        else:
-            self.tx_buffer = data
+            data = data.value.encode(self.ENCODING)
+        if data:
+            self._tx_queue.put_nowait(data)
 
     def change_baudrate(self, baudrate: int):
         """Change baudrate after initialized"""
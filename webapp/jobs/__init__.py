@@ -1,29 +1,72 @@
 import os
-import json
+import bisect
+import functools
 import logging
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from types import MappingProxyType
 from typing import Optional, Union
 
 from apscheduler.job import Job
-from flask import current_app
+from flask import current_app, has_app_context
 from flask_apscheduler import APScheduler
 from serial import SerialException, serial_for_url
+from sqlalchemy import bindparam, delete, insert, lambda_stmt, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, load_only, object_session
 from requests.exceptions import ConnectionError
 
 from webapp import utils
-from webapp.console import JBODCommand, JBODConsole, JBODConsoleException, JBODRxData, ResetEvent
+from webapp.console import JBODCommand, JBODConsole, JBODConsoleException, JBODRxData, ResetEvent, dc2_decoder
 from webapp.jobs import events as ev
-from webapp.models import db, SysConfig, Disk, DiskTemp, Chassis, Fan, FanSetpoint, Controller, \
+from webapp.models import db, SysConfig, Disk, DiskTemp, Chassis, Fan, Controller, \
     PhySlot, SysJob, FanLog, ComStat
 
 scheduler = APScheduler()
 _logger = logging.getLogger("apscheduler_jobs")
 
+# upper bound on daisy-chained controller ids probed by ping_controllers
+MAX_CONTROLLERS = 15
+
+# seconds a fan is given to reach its new speed after a pwm change during calibration
+FAN_SETTLE_SECS = 1.5
+
+# zfs columns of a disk that is not a member of any pool
+ZFS_DISK_DEFAULTS = MappingProxyType({
+    'zfs_pool': None,
+    'zfs_topology': None,
+    'zfs_device_path': None,
+    'read_errors': 0,
+    'write_errors': 0,
+    'checksum_errors': 0,
+})
+
+# open console handle; skips the app context and config lookups in get_console
+_console: Optional[JBODConsole] = None
+
+# {mcu_device_id: {port_num: fan id}} read by the DC2 callback; dropped by _invalidate_topology
+_topology: Optional[dict] = None
+
+
+@contextmanager
+def maybe_app_context():
+    """
+    Pushes the scheduler app context only when one is not already active
+    (i.e. when called from a scheduler thread rather than a request or job)
+    """
+    if has_app_context():
+        yield
+    else:
+        with scheduler.app.app_context():
+            yield
+
 
 def activate_sys_job(job_id: Union[str, int]) -> Optional[Job]:
-    with current_app.app_context():
+    with maybe_app_context():
         job = db.session.query(SysJob).where(SysJob.job_id == job_id).first()
         if not job.active:
             aps_job = scheduler.add_job(**job.job_dict)
@@ -34,7 +77,7 @@ def activate_sys_job(job_id: Union[str, int]) -> Optional[Job]:
 
 
 def deactivate_sys_job(job_id: Union[str, int]) -> Optional[Job]:
-    with current_app.app_context():
+    with maybe_app_context():
         job = db.session.query(SysJob).where(SysJob.job_id == job_id).first()
         if job.active:
             aps_job = scheduler.remove_job(job_id)
@@ -45,7 +88,7 @@ def deactivate_sys_job(job_id: Union[str, int]) -> Optional[Job]:
 
 
 def resume_failed_job(job_id: Union[str, int]) -> Optional[Job]:
-    with current_app.app_context():
+    with maybe_app_context():
         db_job = db.session.query(SysJob).where(SysJob.job_id == job_id).first()
         if db_job.paused:
             resumed_job = scheduler.resume_job(job_id)
@@ -60,25 +103,38 @@ def tty_stat_tracker():
     Stores tx/rx byte tracker hourly into db from memory;
     clears memory tracker
     """
-    with scheduler.app.app_context():
+    with maybe_app_context():
         tty = get_console()
         if not tty:
             _logger.info("tty_at_tracker: no COM connection established; skipping job.")
             return None
         _logger.debug("tty_at_tracker: storing COM stats to database.")
-        curr_stat = db.session.query(ComStat).filter(ComStat.stat_date == datetime.today().date()).first()
-        if not curr_stat:
-            curr_stat = ComStat(stat_date=datetime.today().date())
-            db.session.add(curr_stat)
-            db.session.flush()
-        curr_stat.rx += tty.bytes_recv
-        curr_stat.tx += tty.bytes_trans
-        tty.bytes_recv, tty.bytes_trans = 0, 0
+        rx, tx = tty.bytes_recv, tty.bytes_trans
+        # single atomic upsert of today's counters
+        stmt = sqlite_insert(ComStat).values(stat_date=datetime.today().date(), rx=rx, tx=tx)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ComStat.stat_date],
+            set_={
+                'rx': ComStat.rx + stmt.excluded.rx,
+                'tx': ComStat.tx + stmt.excluded.tx,
+                'modify_date': datetime.utcnow()
+            }
+        )
+        db.session.execute(stmt)
         db.session.commit()
+        # keep bytes counted while the upsert was running
+        tty.bytes_recv -= rx
+        tty.bytes_trans -= tx
 
 
 def get_console() -> Union[JBODConsole, None]:
-    with current_app.app_context():
+    global _console
+    if _console is not None and _console.serial.is_open:
+        return _console
+    with maybe_app_context():
+        if any(tty is not None and not tty.serial.is_open for tty in (_console, getattr(current_app, 'console', None))):
+            # port was closed (failed port change, lost device); rebuild from config
+            invalidate_console()
         if not getattr(current_app, 'console', None):
             port = utils.get_config_value('console_port')
             if not port:
@@ -95,6 +151,7 @@ def get_console() -> Union[JBODConsole, None]:
                         timeout=int(utils.get_config_value('console_timeout')),
                         do_not_open=True),
                     callback=console_callback,
+                    cpu_affinity=current_app.config.get('SERIAL_CPU_AFFINITY'),
                 )
                 tty.start()
                 current_app.__setattr__('console', tty)
@@ -103,7 +160,25 @@ def get_console() -> Union[JBODConsole, None]:
                 current_app.__setattr__('console', None)
                 _logger.error("An error occurred while attempting to connect with controller.")
                 _logger.error(err)
-    return getattr(current_app, 'console')
+        _console = getattr(current_app, 'console')
+    return _console
+
+
+def invalidate_console() -> None:
+    """Stops and closes the current console so the next get_console call re-creates it from config"""
+    global _console
+    cached, _console = _console, None
+    with maybe_app_context():
+        app_console = getattr(current_app, 'console', None)
+        current_app.__setattr__('console', None)
+    for tty in {cached, app_console} - {None}:
+        try:
+            if tty.alive:
+                tty.stop()
+                tty.join()
+            tty.close()
+        except SerialException as err:
+            _logger.debug(f"invalidate_console: error closing {tty.serial.port}: {err}")
 
 
 def get_fan_state():
@@ -128,21 +203,20 @@ def console_connection_check():
     return False
 
 
+@functools.lru_cache(maxsize=1)
 def truenas_connection_info():
     """
     Used in jinja2 templates
+    Cached (decrypts the api key); cleared with utils.clear_config_cache()
     """
-    with current_app.app_context():
-        api_key = db.session.execute(
-            db.select(SysConfig).where(SysConfig.key == "truenas_api_key")
-        ).first()
-        base_url = db.session.execute(
-            db.select(SysConfig).where(SysConfig.key == "truenas_url")
-        ).first()
+    with maybe_app_context():
+        rows = dict(db.session.execute(
+            db.select(SysConfig.key, SysConfig.value).where(SysConfig.key.in_(["truenas_api_key", "truenas_url"]))
+        ).all())
         try:
             return {
-                "api_key": current_app.decrypt(getattr(api_key[0], 'value')).decode(),
-                "ip": getattr(base_url[0], 'value', None).lstrip("http:").strip("/")
+                "api_key": current_app.decrypt(rows.get("truenas_api_key")).decode(),
+                "ip": rows.get("truenas_url").lstrip("http:").strip("/")
             }
         except TypeError:
             return None
@@ -151,53 +225,52 @@ def truenas_connection_info():
 
 
 def query_disk_properties() -> None:
-    with scheduler.app.app_context():
+    with maybe_app_context(), ThreadPoolExecutor(max_workers=1) as executor:
+        # pool and disk requests are sent to TrueNAS concurrently
+        zfs_future = executor.submit(_query_zfs_properties)
         resp = utils.truenas_api_request('GET', '/api/v2.0/disk')
         if not resp:
             _logger.warning("query_disk_properties: no resp returned from GET '/api/v2.0/disk' request.")
             return
         try:
-            zfs_props = _query_zfs_properties()
-            db_serials = [disk.serial for disk in db.session.query(Disk).all()]
-            for disk in resp.json():
-                disk_zfs = zfs_props.get(disk.get('name'), {})
-                if disk.get('serial') in db_serials:
-                    model = db.session.query(Disk).filter(Disk.serial == disk.get('serial')).first()
-                    model.name = disk.get('name', None)
-                    model.devname = disk.get('devname', None)
-                    model.model = disk.get('model', None)
-                    model.serial = disk.get('serial', None)
-                    model.subsystem = disk.get('subsystem', None)
-                    model.size = disk.get('size', None)
-                    model.rotationrate = disk.get('rotationrate', None)
-                    model.type = disk.get('type', None)
-                    model.bus = disk.get('bus', None)
-                    for k, v in disk_zfs.items():
-                        setattr(model, k, v)
-                else:
-                    db.session.add(
-                        Disk(
-                            name=disk.get('name', None),
-                            devname=disk.get('devname', None),
-                            model=disk.get('model', None),
-                            serial=disk.get('serial', None),
-                            subsystem=disk.get('subsystem', None),
-                            size=disk.get('size', None),
-                            rotationrate=disk.get('rotationrate', None),
-                            type=disk.get('type', None),
-                            bus=disk.get('bus', None),
-                            phy_slot_id=None,
-                            **disk_zfs
-                        )
-                    )
+            zfs_props = zfs_future.result()
+            rows = [
+                {
+                    'name': disk.get('name', None),
+                    'devname': disk.get('devname', None),
+                    'model': disk.get('model', None),
+                    'serial': disk.get('serial', None),
+                    'subsystem': disk.get('subsystem', None),
+                    'size': disk.get('size', None),
+                    'rotationrate': disk.get('rotationrate', None),
+                    'type': disk.get('type', None),
+                    'bus': disk.get('bus', None),
+                    # disks outside a pool get cleared zfs columns so every row has the same keys
+                    **ZFS_DISK_DEFAULTS,
+                    **zfs_props.get(disk.get('name'), {}),
+                }
+                for disk in resp.json()
+            ]
+            if rows:
+                # one INSERT ... ON CONFLICT(serial) DO UPDATE for all disks; phy_slot_id is left untouched
+                stmt = sqlite_insert(Disk).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Disk.serial],
+                    set_={
+                        **{k: stmt.excluded[k] for k in rows[0] if k != 'serial'},
+                        'modify_date': datetime.utcnow(),
+                    }
+                )
+                db.session.execute(stmt)
             db.session.commit()
         except IntegrityError:
             db.session.rollback()
 
 
 def query_disk_temperatures() -> None:
-    with scheduler.app.app_context():
-        disks = db.session.query(Disk).all()
+    with maybe_app_context():
+        # only the key and name are needed; temperatures are written back with bulk_update_mappings
+        disks = db.session.query(Disk).options(load_only(Disk.serial, Disk.name)).all()
         if not disks:
             _logger.warning("query_disk_temperatures scheduled job skipped. No disks to query.")
             return
@@ -210,12 +283,21 @@ def query_disk_temperatures() -> None:
             )
             if resp.status_code == 200:
                 _logger.debug(f"query_disk_temperatures received a valid response from host; {resp}")
-                for _name, temp in resp.json().items():
-                    for disk in disks:
-                        if disk.name == _name:
-                            disk.temperature = temp
-                            disk.last_temp_reading = datetime.utcnow()
-                            break
+                serial_by_name = {disk.name: disk.serial for disk in disks}
+                now = datetime.utcnow()
+                readings = [
+                    (serial_by_name[_name], temp) for _name, temp in resp.json().items() if _name in serial_by_name
+                ]
+                db.session.bulk_update_mappings(Disk, [
+                    {'serial': serial, 'temperature': temp, 'last_temp_reading': now} for serial, temp in readings
+                ])
+                # temperature history; one executemany insert (disks in standby report no temperature)
+                history = [
+                    {'disk_serial': serial, 'temp': temp, 'create_date': now} for serial, temp in readings
+                    if temp is not None
+                ]
+                if history:
+                    db.session.execute(insert(DiskTemp), history)
                 db.session.commit()
             else:
                 Exception(f"query_disk_temperatures api response code != 200: {resp.status_code}")
@@ -225,7 +307,7 @@ def query_disk_temperatures() -> None:
 
 
 def _query_zfs_properties() -> dict:
-    """Ran inside query disk properties job"""
+    """Ran inside query disk properties job (on a worker thread)"""
     resp = utils.truenas_api_request('GET', '/api/v2.0/pool')
     if resp.status_code == 200:
         _logger.debug(f"_query_zfs_properties received a valid response from host; {resp}")
@@ -233,15 +315,14 @@ def _query_zfs_properties() -> dict:
         data = resp.json()
         disks = {}
         for pool in data:
-            # will return a list of attribute string paths to {type: DISK}
+            # yields each {type: DISK} object with its path in a single walk of the pool
             # root path is zfs pool > topology > [data,log,cache,spare,special,dedup] > device
             # device path is index > children[] > device (can have multiple device hierarchies)
-            for path in list(utils.json_path_generator('type', 'DISK', pool)):
+            for path, disk in utils.json_match_generator('type', 'DISK', pool):
                 disk_props = {}
-                # topology.data.0.children.0.type
-                disk = utils.resolve_string_attr(pool, path)  # returns disk object
+                # ('topology', 'data', 0, 'children', 0)
                 disk_props['zfs_pool'] = pool['name']
-                disk_props['zfs_topology'] = path.split('.')[1]
+                disk_props['zfs_topology'] = path[1]
                 disk_props['zfs_device_path'] = disk['path']
                 # stats
                 disk_props['read_errors'] = disk['stats']['read_errors']
@@ -263,13 +344,15 @@ def query_host_state() -> str:
 
 def poll_setpoints() -> None:
     # TODO: Figure out a better way of dealing with serial race condition
-    with scheduler.app.app_context():
+    with maybe_app_context():
         job = db.session.query(SysJob).where(SysJob.job_id == 'poll_controller_data').first()
         if not job.paused:
             scheduler.pause_job('poll_controller_data')
-        # give read thread loop time to clear buffer
-        time.sleep(0.2)
+        # runs in this job (not a follow-up) so failures count against poll_setpoints
+        # and controller polling is always resumed
         try:
+            # give read thread loop time to clear buffer
+            time.sleep(0.2)
             _poll_setpoints()
         finally:
             if not job.paused:
@@ -281,118 +364,104 @@ def _poll_setpoints() -> None:
     Polls disk temps and sets the corresponding fan PWM setpoint.
     Writes any changes to database.
     """
-    with scheduler.app.app_context():
+    with maybe_app_context():
         tty = get_console()
         if not tty:
             raise SerialException("Serial connection not established.")
-        jbods = db.session.query(Chassis).where(Chassis.controller_id != None).all()  # noqa
+        # controller is joined, fans are loaded in one batch; Fan.setpoints is selectin-loaded by the mapper
+        jbods = db.session.query(Chassis) \
+            .options(joinedload(Chassis.controller).selectinload(Controller.fans)) \
+            .where(Chassis.controller_id != None) \
+            .all()
         # stop process if no chassis is defined
         if not jbods:
             _logger.warning("No chassis defined, skipping job: poll_setpoints")
             return None
-        # get disk temps grouped by chassis
+        # disk count and max disk temp per chassis, aggregated by the database
+        disk_temps = {
+            chassis_id: (disk_cnt, max_temp)
+            for chassis_id, disk_cnt, max_temp in db.session.query(
+                PhySlot.chassis_id, db.func.count(Disk.serial), db.func.max(Disk.temperature)
+            ).join(PhySlot.disk)
+            .where(PhySlot.chassis_id.in_([jbod.id for jbod in jbods]))
+            .group_by(PhySlot.chassis_id)
+            .all()
+        }
         for jbod in jbods:
-            disks = db.session.query(Disk).join(PhySlot).filter(PhySlot.chassis_id == jbod.id).all()
-            # disks = db.session.query(Disk).where(Disk.chassis_id == jbod.id).all()
-            _logger.debug(f"poll_setpoints: chassis: {jbod.name or jbod.id}; Disks: {disks}")
-            if not len(disks) > 0:
+            disk_cnt, temp_agg = disk_temps.get(jbod.id, (0, None))
+            _logger.debug(f"poll_setpoints: chassis: {jbod.name or jbod.id}; Disks: {disk_cnt}; Max temp: {temp_agg}")
+            if not disk_cnt > 0:
                 _logger.warning("No disks assigned to chassis %s, %s", jbod.name, jbod.id)
                 continue
-            fans = db.session.query(Fan).where(
-                Fan.controller_id == jbod.controller.id,
-                Fan.active == True,
-                Fan.four_pin == True
-            ).all()
+            fans = [fan for fan in jbod.controller.fans if fan.active and fan.four_pin]
             if not fans:
                 _logger.warning(f"poll_setpoints: No active pwm fans found for {jbod.name or jbod.id} chassis;")
                 continue
-            try:
-                temp_agg = max([int(d.temperature) for d in disks if d.temperature])
-            except ValueError:
-                _logger.warning(f"poll_setpoints: No numeric temperature values for chassis {jbod.name or jbod.id}; "
-                                f"temperature: {[d.temperature for d in disks]}")
+            if temp_agg is None:
+                _logger.warning(f"poll_setpoints: No numeric temperature values for chassis {jbod.name or jbod.id}")
                 continue
-            # get all setpoint models for each fan
-            for fan in fans:
-                # skip fans that are not four pin (PWM)
-                new_pwm = None
-                setpoints = db.session.query(FanSetpoint) \
-                    .where(FanSetpoint.fan_id == fan.id) \
-                    .order_by(FanSetpoint.temp) \
-                    .all()
-                # if the first setpoint is higher than the temp_agg, use it
-                if setpoints[0].temp > temp_agg:
-                    new_pwm = setpoints[0].pwm
-                else:
-                    # find setpoint best matching current temp avg
-                    for i, _ in enumerate(setpoints):
-                        try:
-                            if setpoints[i].temp <= temp_agg <= setpoints[i + 1].temp:
-                                new_pwm = setpoints[i].pwm
-                                continue
-                        except IndexError:
-                            new_pwm = setpoints[-1].pwm
-                # only send changes if value has changed
-                if new_pwm != fan.pwm and new_pwm is not None:
-                    tty.command_write(JBODCommand.PWM, jbod.controller.id, fan.port_num, new_pwm)
-                    fan.pwm = new_pwm
+            # pwm changes are written to the db once per chassis, including those sent before a failure
+            updates = []
+            try:
+                # get all setpoint models for each fan
+                for fan in fans:
+                    setpoints = fan.setpoints  # ordered by temp
+                    if not setpoints:
+                        _logger.warning("poll_setpoints: No setpoints defined for fan %s", fan.id)
+                        continue
+                    # highest setpoint at or below temp_agg; first setpoint if temp_agg is below all of them
+                    i = bisect.bisect_right([sp.temp for sp in setpoints], temp_agg) - 1
+                    new_pwm = setpoints[max(i, 0)].pwm
+                    # only send changes if value has changed
+                    if new_pwm != fan.pwm and new_pwm is not None:
+                        tty.command_write(JBODCommand.PWM, jbod.controller_id, fan.port_num, new_pwm)
+                        # write changes to db if request is successful
+                        updates.append({'id': fan.id, 'pwm': new_pwm})
+                        _logger.info("Fan %s setpoint updated; New PWM: %s", fan.id, new_pwm)
+                    else:
+                        _logger.debug("Fan %s setpoint is correct; no changes made", fan.id)
+            finally:
+                if updates:
+                    db.session.bulk_update_mappings(Fan, updates)
                     db.session.commit()
-                    # write changes to db if request is successful
-                    _logger.info("Fan %s setpoint updated; New PWM: %s", fan.id, new_pwm)
-                else:
-                    _logger.debug("Fan %s setpoint is correct; no changes made", fan.id)
 
 
 def ping_controllers(controller_id: Optional[int] = None) -> Union[list[dict], list[None]]:
     """
-    Loop increments id calling DEVICE_ID command until either NAK or no response
+    Probes controller ids with DEVICE_ID in one burst; ids respond in order until either NAK or no response
     @param controller_id: will only ping this controller if provided
     @return: list of responding device ids
     """
-    with current_app.app_context():
-        resp = []
-        next_id = controller_id or 1
+    with maybe_app_context():
         tty = get_console()
-        while True:
-            # continue to loop until either NAK or no response
-            try:
-                # using DEVICE_ID rather than PING to get mcu id from response
-                dev_id = tty.command_write(JBODCommand.DEVICE_ID, next_id)
-                resp.append({"id": next_id, "mcu_device_id": str(dev_id.data)})
-            except JBODConsoleException as err:
-                if next_id == 1:
-                    _logger.error(f"Controller on {tty.serial.port} did not respond to ID request. {err}")
-                break
-            if next_id == controller_id:
-                break
-            next_id += 1
-        return resp
+        ids = [controller_id] if controller_id else range(1, MAX_CONTROLLERS + 1)
+        # using DEVICE_ID rather than PING to get mcu id from response
+        replies = tty.command_write_burst([(JBODCommand.DEVICE_ID, i) for i in ids], stop_on_nak=True)
+        if not replies and ids[0] == 1:
+            _logger.error(f"Controller on {tty.serial.port} did not respond to ID request.")
+        return [{"id": i, "mcu_device_id": str(dev_id.data)} for i, dev_id in zip(ids, replies)]
 
 
 def query_controller_properties(controller: Controller) -> Controller:
-    with scheduler.app.app_context():
+    with maybe_app_context():
         tty = get_console()
         if not tty:
             raise SerialException("Serial connection not established.")
         try:
-            # returns a UUID of device id
-            dev_id = tty.command_write(JBODCommand.DEVICE_ID, controller.id)
+            # all four property requests go out in one serial write
+            dev_id, fc, fw, psu = tty.command_write_many([
+                (JBODCommand.DEVICE_ID, controller.id),  # returns a UUID of device id
+                (JBODCommand.FAN_CNT, controller.id),  # total fan ports supported by controller
+                (JBODCommand.FIRMWARE_VERSION, controller.id),
+                (JBODCommand.STATUS, controller.id),  # PSU status
+            ])
             controller.mcu_device_id = str(dev_id.data)
-
-            # get total fan ports supported by controller
-            fc = tty.command_write(JBODCommand.FAN_CNT, controller.id)
             try:
                 controller.fan_port_cnt = int(fc.data)
             except ValueError:
                 _logger.error(f"Received a non-integer value for fan_port_cnt: {fc}")
                 controller.fan_port_cnt = 0
-
-            # get firmware version
-            fw = tty.command_write(JBODCommand.FIRMWARE_VERSION, controller.id)
             controller.firmware_version = fw.data
-
-            # get PSU status
-            psu = tty.command_write(JBODCommand.STATUS, controller.id)
             controller.psu_on = psu.data == 'ON'
 
             controller.alive = True
@@ -403,18 +472,20 @@ def query_controller_properties(controller: Controller) -> Controller:
 
 
 def database_cleanup():
-    with scheduler.app.app_context():
+    with maybe_app_context():
         # clean up each table storing historical data
         filter_before = datetime.utcnow() - timedelta(days=2)
-        old_temps = db.session.query(DiskTemp).filter(DiskTemp.create_date <= filter_before).all() or []
-        old_logs = db.session.query(FanLog).filter(FanLog.create_date <= filter_before).all() or []
-        old_stats = db.session.query(ComStat).filter(ComStat.stat_date <= filter_before).all() or []
-        rows = old_temps + old_logs + old_stats
-        _logger.info(f"database_cleanup: {len(rows) if rows else 0} rows being removed from database.")
-        if rows:
-            for r in rows:
-                db.session.delete(r)
-            db.session.commit()
+        # bulk deletes on indexed date columns; rows are never loaded into the session
+        rows = sum(
+            db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+            for stmt in (
+                delete(DiskTemp).where(DiskTemp.create_date <= filter_before),
+                delete(FanLog).where(FanLog.create_date <= filter_before),
+                delete(ComStat).where(ComStat.stat_date <= filter_before.date()),
+            )
+        )
+        db.session.commit()
+        _logger.info(f"database_cleanup: {rows} rows removed from database.")
         # clean up upload files
         upload_dir = current_app.config['UPLOAD_FOLDER']
         if len(os.listdir(upload_dir)) == 0:
@@ -431,12 +502,14 @@ def poll_controller_data() -> None:
     the console write thread. Responses are handled by the console
     callback (ds2 messages).
     """
-    with scheduler.app.app_context():
+    # console is created at startup; only fall back to get_console (db + app context) when it is missing or closed
+    tty = getattr(scheduler.app, 'console', None)
+    if not tty or not tty.serial.is_open:
         tty = get_console()
-        if not tty.serial.is_open:
-            raise SerialException("Serial connection not established.")
-        # controller responds to DC2 requests with json-like object
-        tty.transmit(tty.ctrlc.DC2)
+    if not tty:
+        raise SerialException("Serial connection not established.")
+    # controller responds to DC2 requests with json-like object
+    tty.transmit_nowait(tty.ctrlc.DC2)
 
 
 def _poll_controller_data() -> None:
@@ -445,22 +518,25 @@ def _poll_controller_data() -> None:
     Updates controllers 'alive' to false if no response is received within
     2x of poll_controller_data scheduled runtime interval.
     """
-    with scheduler.app.app_context():
-        job = db.session.query(SysJob).where(SysJob.job_id == 'poll_controller_data').first()
+    with maybe_app_context():
+        job = db.session.execute(
+            lambda_stmt(lambda: select(SysJob).where(SysJob.job_id == 'poll_controller_data'))
+        ).scalars().first()
         if job.active:
-            ctrlr = db.session.query(Controller).all()
-            for c in ctrlr:
-                if not c.last_ds2:
-                    pass
-                elif c.last_ds2 >= (datetime.utcnow() - timedelta(seconds=job.seconds * 2, minutes=job.minutes * 2)):
-                    c.alive = True
-                else:
-                    c.alive = False
+            cutoff = datetime.utcnow() - timedelta(seconds=job.seconds * 2, minutes=job.minutes * 2)
+            responded = Controller.last_ds2 >= cutoff
+            # single UPDATE; only rows whose alive state changes are touched (keeps modify_date meaningful)
+            db.session.execute(
+                update(Controller)
+                .where(Controller.last_ds2 != None, Controller.alive.is_distinct_from(responded))  # noqa
+                .values(alive=responded)
+                .execution_options(synchronize_session=False)
+            )
             db.session.commit()
 
 
 def sound_controller_alarm(controller_id: int, duration: int = 3) -> None:
-    with scheduler.app.app_context():
+    with maybe_app_context():
         tty = get_console()
         if not tty:
             raise SerialException("Serial connection not established.")
@@ -471,7 +547,7 @@ def sound_controller_alarm(controller_id: int, duration: int = 3) -> None:
 
 
 def toggle_controller_led(controller_id: int, duration: int = 10) -> None:
-    with scheduler.app.app_context():
+    with maybe_app_context():
         tty = get_console()
         if not tty:
             raise SerialException("Serial connection not established.")
@@ -482,7 +558,7 @@ def toggle_controller_led(controller_id: int, duration: int = 10) -> None:
 
 
 def reset_controller_mcu(controller_id: int) -> None:
-    with scheduler.app.app_context():
+    with maybe_app_context():
         tty = get_console()
         if not tty:
             raise SerialException("Serial connection not established.")
@@ -490,7 +566,7 @@ def reset_controller_mcu(controller_id: int) -> None:
 
 
 def _truenas_shutdown(tty: JBODConsole):
-    with scheduler.app.app_context():
+    with maybe_app_context():
         _logger.info("Shutdown request received from controller. "
                      "Attempting to shutdown host now.")
         resp = utils.truenas_api_request(
@@ -517,7 +593,7 @@ def console_callback(tty: JBODConsole, rx: JBODRxData):
     Function called when data is received from controller that was not
     requested by JBODConsole write_command
     """
-    with scheduler.app.app_context():
+    with maybe_app_context():
         if rx.xoff:
             _truenas_shutdown(tty)
         elif rx.xon:
@@ -527,28 +603,54 @@ def console_callback(tty: JBODConsole, rx: JBODRxData):
             # response example: {466-2038344B513050-19-1003:{psu:ON,rpm:[1000,1200,0,3000],pwm:[40,30,0,20]}}
             _logger.debug("Attempting to parse rpm data: %s", rx.raw_data)
             try:
-                resp = json.loads(rx.data.strip("\r\n\x00"))
-                ctrlr = db.session.query(Controller).where(Controller.mcu_device_id == resp['mcu']).first()
-                data = resp['data']
-                _logger.debug("Controller matched to ds2: %s", ctrlr)
+                # payload is the undecoded message body; decoded straight into DC2Message
+                resp = dc2_decoder.decode(rx.payload)
+                mcu = resp.mcu
+                data = resp.data
+                # fan ids come from the cached topology; the whole ds2 update runs without a SELECT
+                fans = _controller_topology().get(mcu)
+                if fans is None:
+                    _logger.warning("No controller matched to ds2: %s", rx)
+                    return
+                now = datetime.utcnow()
 
                 # update psu status if needed
-                if (ctrlr.psu_on == True and data['psu'] != "ON") or (ctrlr.psu_on == False and data['psu'] == "ON"):
-                    ctrlr.psu_on = data['psu'] == "ON"
-                    _logger.info("psu status for %s updated to %s", ctrlr.mcu_device_id, ctrlr.psu_on)
+                psu_on = data.psu == "ON"
+                if db.session.execute(
+                    update(Controller)
+                    .where(Controller.mcu_device_id == mcu, Controller.psu_on.is_distinct_from(psu_on))
+                    .values(psu_on=psu_on)
+                    .execution_options(synchronize_session=False)
+                ).rowcount:
+                    _logger.info("psu status for %s updated to %s", mcu, psu_on)
 
                 # update fan(s) rpm and pwm values
-                for i, rpm in enumerate(data['rpm']):
-                    fan = db.session.query(Fan).where(Fan.controller_id == ctrlr.id, Fan.port_num == i + 1).first()
-                    if not fan:
+                readings = []
+                for i, rpm in enumerate(data.rpm):
+                    fan_id = fans.get(i + 1)
+                    if not fan_id:
                         _logger.warning("Unable to find associated fan for rpm data: %s", rx)
-                    else:
-                        fan.pwm = data['pwm'][i]
-                        fan.rpm = int(rpm)
-                        fan.last_report = datetime.utcnow()
-                        _logger.debug("Stored fan[%s] rpm: %s", fan.id, fan.rpm)
-                ctrlr.last_ds2 = datetime.utcnow()
-                ctrlr.alive = True
+                        continue
+                    readings.append({'id': fan_id, 'rpm': rpm, 'pwm': data.pwm[i]})
+                    _logger.debug("Stored fan[%s] rpm: %s", fan_id, rpm)
+                if readings:
+                    db.session.bulk_update_mappings(Fan, [
+                        {'id': r['id'], 'rpm': r['rpm'], 'last_report': now} for r in readings
+                    ])
+                    # pwm only where changed; the fan_log trigger fires on every row updated OF pwm
+                    db.session.execute(
+                        update(Fan.__table__)
+                        .where(Fan.__table__.c.id == bindparam('fan_id'),
+                               Fan.__table__.c.pwm.is_distinct_from(bindparam('new_pwm')))
+                        .values(pwm=bindparam('new_pwm')),
+                        [{'fan_id': r['id'], 'new_pwm': r['pwm']} for r in readings]
+                    )
+                db.session.execute(
+                    update(Controller)
+                    .where(Controller.mcu_device_id == mcu)
+                    .values(last_ds2=now, alive=True)
+                    .execution_options(synchronize_session=False)
+                )
                 db.session.commit()
             except Exception as err:  # noqa
                 _logger.error("Unable to parse controller data: %s", rx)
@@ -565,43 +667,97 @@ def console_callback(tty: JBODConsole, rx: JBODRxData):
             _logger.warning("Uncaught console event received: %s", rx)
 
 
+def _controller_topology() -> dict:
+    """
+    Returns {mcu_device_id: {port_num: fan id}} from the module cache;
+    rebuilt after _invalidate_topology drops it.
+    """
+    global _topology
+    topology = _topology
+    if topology is None:
+        # plain columns; no Controller/Fan entities (or their eager loads) are built
+        topology = {}
+        for mcu, port_num, fan_id in db.session.query(Controller.mcu_device_id, Fan.port_num, Fan.id) \
+                .outerjoin(Controller.fans).all():
+            ports = topology.setdefault(mcu, {})
+            if fan_id is not None:
+                ports[port_num] = fan_id
+        _topology = topology
+    return topology
+
+
+def _invalidate_topology() -> None:
+    """Drops the cached topology"""
+    global _topology
+    _topology = None
+
+
+def _topology_written(mapper, connection, target) -> None:
+    """
+    Controller/Fan mapper event hook (runs at flush). Drops the topology now and flags the session so it
+    is dropped again at commit/rollback; the callback thread may rebuild from the old committed rows in between.
+    """
+    _invalidate_topology()
+    session = object_session(target)
+    if session is not None:
+        session.info['topology_written'] = True
+
+
+def _topology_written_on_update(mapper, connection, target) -> None:
+    """Mapper event hook; only a re-keyed controller or fan changes the topology"""
+    attrs = db.inspect(target).attrs
+    if any(attrs[key].history.has_changes() for key in ('id', 'mcu_device_id', 'controller_id', 'port_num')
+           if key in attrs):
+        _topology_written(mapper, connection, target)
+
+
+def _topology_session_end(session, *args) -> None:
+    """Session after_commit/after_rollback hook"""
+    if session.info.pop('topology_written', False):
+        _invalidate_topology()
+
+
+for _model in (Controller, Fan):
+    db.event.listen(_model, 'after_insert', _topology_written)
+    db.event.listen(_model, 'after_delete', _topology_written)
+    db.event.listen(_model, 'after_update', _topology_written_on_update)
+for _event in ('after_commit', 'after_rollback'):
+    db.event.listen(Session, _event, _topology_session_end)
+
+
 def cascade_controller_fan(controller_id: int):
     """checks if a four pin fan; should be called when controller is added"""
-    with scheduler.app.app_context():
-        FOUR_PIN_RPM_DEVIATION = int(utils.get_config_value('four_pin_rpm_deviation'))
-        MAX_FAN_PWM = int(utils.get_config_value('max_fan_pwm'))
-        RPM_READ_DELAY = float(utils.get_config_value('rpm_read_delay'))
+    with maybe_app_context():
+        cfg = utils.get_config_values('four_pin_rpm_deviation', 'max_fan_pwm', 'rpm_read_delay')
+        FOUR_PIN_RPM_DEVIATION = int(cfg['four_pin_rpm_deviation'])
+        MAX_FAN_PWM = int(cfg['max_fan_pwm'])
+        RPM_READ_DELAY = float(cfg['rpm_read_delay'])
         model = utils.get_model_by_id(Controller, controller_id)
         tty = get_console()
-        fans = []
-        for i in range(model.fan_port_cnt):
-            f = Fan(controller_id=model.id, port_num=i + 1)
-            db.session.add(f)
-            db.session.flush()
-            fans.append(f)
+        fans = [Fan(controller_id=model.id, port_num=i + 1) for i in range(model.fan_port_cnt)]
+        db.session.add_all(fans)
         db.session.commit()
+        # each step is sent to the controller as one batch of commands
         starting_rpm = []
-        for fan in fans:
-            ret = tty.command_write(tty.cmd.RPM, fan.controller_id, fan.port_num)
+        rpm_resp = tty.command_write_many([(tty.cmd.RPM, fan.controller_id, fan.port_num) for fan in fans])
+        for fan, ret in zip(fans, rpm_resp):
             fan.rpm = int(ret.data)
             if int(ret.data) == 0:
                 fan.active = False
                 continue
             fan.active = True
             starting_rpm.append(int(ret.data))
-            tty.command_write(tty.cmd.PWM, fan.controller_id, fan.port_num, MAX_FAN_PWM)
+        active_fans = [fan for fan in fans if fan.active]
+        tty.command_write_many([(tty.cmd.PWM, fan.controller_id, fan.port_num, MAX_FAN_PWM) for fan in active_fans])
         db.session.commit()
         _logger.debug(f"cascade_fan: starting_rpm: {starting_rpm}")
         time.sleep(RPM_READ_DELAY)
-        finishing_rpm = []
-        for fan in fans:
-            if fan.active:
-                ret = tty.command_write(tty.cmd.RPM, fan.controller_id, fan.port_num)
-                finishing_rpm.append(int(ret.data))
-                tty.command_write(tty.cmd.PWM, fan.controller_id, fan.port_num, fan.pwm)
+        rpm_resp = tty.command_write_many([(tty.cmd.RPM, fan.controller_id, fan.port_num) for fan in active_fans])
+        finishing_rpm = [int(ret.data) for ret in rpm_resp]
+        tty.command_write_many([(tty.cmd.PWM, fan.controller_id, fan.port_num, fan.pwm) for fan in active_fans])
         rpm_delta = [abs(x - y) for x, y in list(zip(starting_rpm, finishing_rpm))]
         _logger.debug(f"cascade_fan: finishing_rpm: {finishing_rpm}; delta: {rpm_delta}")
-        for i, fan in enumerate([fan for fan in fans if fan.active]):
+        for i, fan in enumerate(active_fans):
             if rpm_delta[i] > FOUR_PIN_RPM_DEVIATION:
                 fan.four_pin = True
                 utils.cascade_add_setpoints(fan.id)
@@ -613,15 +769,16 @@ def fan_calibration(fan_id: Union[int, str]) -> None:
     Ran to determine fan RPM to PWM curve. Should only run
     once when a fan is installed or when the fan RPM curve
     deviates outside the allowable range.
+    RPM sampling continues in one-shot _fan_calibration_step jobs so
+    the worker is not held while the fan settles.
     """
-    max_wait_secs = 5  # max seconds to wait for rpm to normalize
-    wait_secs = 0
-    with scheduler.app.app_context():
+    with maybe_app_context():
         # get config values
-        MIN_FAN_PWM = int(utils.get_config_value('min_fan_pwm'))
-        MAX_FAN_PWM = int(utils.get_config_value('max_fan_pwm'))
-        DEFAULT_FAN_PWM = int(utils.get_config_value('default_fan_pwm'))
-        # get consoleF
+        cfg = utils.get_config_values('min_fan_pwm', 'max_fan_pwm', 'default_fan_pwm')
+        MIN_FAN_PWM = int(cfg['min_fan_pwm'])
+        MAX_FAN_PWM = int(cfg['max_fan_pwm'])
+        DEFAULT_FAN_PWM = int(cfg['default_fan_pwm'])
+        # get console
         tty = get_console()
         if not tty:
             raise SerialException("Serial connection not established.")
@@ -640,37 +797,58 @@ def fan_calibration(fan_id: Union[int, str]) -> None:
         original_pwm = fan_model.pwm if MIN_FAN_PWM < fan_model.pwm < MAX_FAN_PWM else DEFAULT_FAN_PWM
         _logger.debug(f"fan_calibration: initial values; rpm={original_rpm}; pwm={original_pwm}")
         tty.command_write(JBODCommand.PWM, fan_model.controller_id, fan_model.id, MIN_FAN_PWM)
-        # wait for rpm value to normalize
-        r = tty.command_write(JBODCommand.RPM, fan_model.controller_id, fan_model.id)
-        new_rpm = int(r.data)
-        prev_rpm = 0
-        while abs(new_rpm - prev_rpm) > 100 and wait_secs <= max_wait_secs:
-            time.sleep(1)
-            prev_rpm = new_rpm
-            r = tty.command_write(JBODCommand.RPM, fan_model.controller_id, fan_model.id)
-            _logger.debug(f"fan_calibration: min_pwm loop: rpm value: {int(r.data)}")
-            new_rpm = int(r.data)
-            wait_secs += 1
-        _logger.debug(f"fan_calibration: min rpm normalization took {wait_secs} secs.  "
-                      f"New min rpm value is {round(new_rpm, -2)}")
-        # store new readings in min_rpm; round to the nearest 100th
-        fan_model.min_rpm = round(new_rpm, -2)
-        # Set fan to max PWM
-        tty.command_write(JBODCommand.PWM, fan_model.controller_id, fan_model.id, MAX_FAN_PWM)
-        # wait for rpm value to normalize
-        time.sleep(0.5)
-        r = tty.command_write(JBODCommand.RPM, fan_model.controller_id, fan_model.id)
-        new_rpm = int(r.data)
-        wait_secs = 0
-        while abs(new_rpm - prev_rpm) > 100 and wait_secs <= max_wait_secs:
-            time.sleep(1)
-            prev_rpm = new_rpm
-            r = tty.command_write(JBODCommand.RPM, fan_model.controller_id, fan_model.id)
-            new_rpm = int(r.data)
-            wait_secs += 1
-        _logger.debug(f"fan_calibration: max rpm normalization took {wait_secs} secs.  "
-                      f"New min rpm value is {round(new_rpm, -2)}")
-        fan_model.max_rpm = round(new_rpm, -2)
+        _schedule_fan_calibration_step(fan_model, FAN_SETTLE_SECS, 'min_rpm', original_rpm, original_pwm)
+
+
+def _schedule_fan_calibration_step(fan_model: Fan, delay: float, *args) -> None:
+    """
+    Schedules the next calibration step; the fan's calibration_job_uuid
+    follows the step so fan_calibration_job_listener reports on the last one.
+    """
+    step_uuid = str(uuid.uuid4())
+    fan_model.calibration_job_uuid = step_uuid
+    db.session.commit()
+    scheduler.add_job(
+        id=step_uuid,
+        name='fan_calibration',
+        func='webapp.jobs:_fan_calibration_step',
+        trigger='date',
+        run_date=datetime.now() + timedelta(seconds=delay),
+        args=(fan_model.id, *args),
+        replace_existing=True,
+    )
+
+
+def _fan_calibration_step(fan_id: int, target: str, original_rpm: int, original_pwm: int) -> None:
+    """
+    Single rpm sample of fan_calibration, ran FAN_SETTLE_SECS after the pwm change.
+    Two back-to-back readings must agree for the rpm at the current target
+    ('min_rpm' or 'max_rpm') to be accepted; the calibration fails otherwise.
+    """
+    with maybe_app_context():
+        tty = get_console()
+        if not tty:
+            raise SerialException("Serial connection not established.")
+        fan_model = utils.get_model_by_id(Fan, fan_id)
+        first, second = tty.command_write_many([
+            (JBODCommand.RPM, fan_model.controller_id, fan_model.id),
+            (JBODCommand.RPM, fan_model.controller_id, fan_model.id),
+        ])
+        new_rpm = int(second.data)
+        _logger.debug(f"fan_calibration: {target} rpm values: {first.data}, {second.data}")
+        if abs(new_rpm - int(first.data)) > 100:
+            tty.command_write(JBODCommand.PWM, fan_model.controller_id, fan_model.id, original_pwm)
+            raise Exception(f"fan_calibration: fan {fan_model.id} {target} did not settle within "
+                            f"{FAN_SETTLE_SECS} secs; readings {first.data} and {second.data}.")
+        _logger.debug(f"fan_calibration: new {target} value is {round(new_rpm, -2)}")
+        # store new readings; round to the nearest 100th
+        setattr(fan_model, target, round(new_rpm, -2))
+        if target == 'min_rpm':
+            # Set fan to max PWM
+            MAX_FAN_PWM = int(utils.get_config_value('max_fan_pwm'))
+            tty.command_write(JBODCommand.PWM, fan_model.controller_id, fan_model.id, MAX_FAN_PWM)
+            _schedule_fan_calibration_step(fan_model, FAN_SETTLE_SECS, 'max_rpm', original_rpm, original_pwm)
+            return
         # define four pin
         if fan_model.min_rpm in range(fan_model.max_rpm - 100, fan_model.max_rpm + 100):
             fan_model.four_pin = False
@@ -2,6 +2,9 @@ import logging
 import uuid
 from datetime import datetime, timedelta
 
+from serial import SerialException
+from sqlalchemy import update
+
 from webapp import utils, jobs
 from webapp.models import db, Fan, SysJob
 
@@ -10,17 +13,17 @@ _logger = logging.getLogger('apscheduler_events')
 
 def fan_calibration_job_listener(event):
     """Single trigger event listener"""
-    with jobs.scheduler.app.app_context():
-        fan = db.session.query(Fan).where(Fan.calibration_job_uuid == getattr(event, 'job_id')).first()
-        original_rpm = fan.rpm
-        if fan:
-            if event.exception:
-                fan.calibration_status = utils.StatusFlag.FAIL
-            else:
-                fan.calibration_status = utils.StatusFlag.COMPLETE
-            # set fan rpm so SQLAlchemy onupdate on 'active' column works correctly
-            fan.rpm = original_rpm
-            db.session.commit()
+    status = utils.StatusFlag.FAIL if event.exception else utils.StatusFlag.COMPLETE
+    with jobs.maybe_app_context():
+        # matches the fan's latest calibration step only; earlier steps no longer match
+        updated = db.session.execute(
+            update(Fan)
+            .where(Fan.calibration_job_uuid == event.job_id)
+            .values(calibration_status=status)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if updated:
             # remove itself after triggering on fan job
             jobs.scheduler.remove_listener(fan_calibration_job_listener)
 
@@ -33,14 +36,18 @@ def job_missed_listener(event):
 def job_error_listener(event):
     """Job error event."""
     _logger.error(f"Scheduled job {event.job_id} failed. Error: {event.exception}")
-    with jobs.scheduler.app.app_context():
-        job = db.session.query(SysJob).where(SysJob.job_id == getattr(event, 'job_id')).first()
+    if isinstance(event.exception, SerialException):
+        # console is rebuilt from config on the next get_console call
+        jobs.invalidate_console()
+    with jobs.maybe_app_context():
+        job = db.session.query(SysJob).where(SysJob.job_id == event.job_id).first()
         if job:
             job.consecutive_failures += 1
-            if job.consecutive_failures > int(utils.get_config_value('job_max_failures')):
+            cfg = utils.get_config_values('job_max_failures', 'job_paused_minutes')
+            if job.consecutive_failures > int(cfg['job_max_failures']):
                 jobs.scheduler.pause_job(event.job_id)
                 job.paused = True
-                pause_minutes = utils.get_config_value('job_paused_minutes')
+                pause_minutes = cfg['job_paused_minutes']
                 resume_job = {
                     "id": str(uuid.uuid4()),
                     "name": "resume_failed_job",
@@ -58,32 +65,41 @@ def job_error_listener(event):
 def job_executed_listener(event):
     """Job executed event."""
     _logger.info(f"Scheduled job {event.job_id} executed.")
-    with jobs.scheduler.app.app_context():
-        job = db.session.query(SysJob).where(SysJob.job_id == getattr(event, 'job_id')).first()
-        if job:
-            job.consecutive_failures = 0
-            db.session.commit()
+    with jobs.maybe_app_context():
+        # no-op write unless the job had failures to clear
+        db.session.execute(
+            update(SysJob)
+            .where(SysJob.job_id == event.job_id, SysJob.consecutive_failures != 0)
+            .values(consecutive_failures=0)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
 
 
 def job_added_listener(event):
     """Job added event."""
-    with jobs.scheduler.app.app_context():
-        _logger.info(f"Scheduled job {event.job_id} added to job store.")
-        if event.job_id == 'poll_controller_data':
-            # add companion func; used to monitor dc2 responses and update controller alive state
-            # must be a separate job b/c the dc2 request is sent in a separate thread and returned in callback
-            job = db.session.query(SysJob).where(SysJob.job_id == getattr(event, 'job_id')).first()
-            jobs.scheduler.add_job('_poll_controller_data', func="webapp.jobs:_poll_controller_data",
-                                   trigger='interval', seconds=job.seconds * 2 + 1, minutes=job.minutes * 2)
+    _logger.info(f"Scheduled job {event.job_id} added to job store.")
+    if event.job_id == 'poll_controller_data':
+        # add companion func; used to monitor dc2 responses and update controller alive state
+        # must be a separate job b/c the dc2 request is sent in a separate thread and returned in callback
+        # interval comes from the job's own trigger; only falls back to the SysJob row if it has none
+        interval = getattr(getattr(jobs.scheduler.get_job(event.job_id), 'trigger', None), 'interval', None)
+        if interval is not None:
+            seconds, minutes = interval.total_seconds(), 0
+        else:
+            with jobs.maybe_app_context():
+                job = db.session.query(SysJob).where(SysJob.job_id == event.job_id).first()
+                seconds, minutes = job.seconds, job.minutes
+        jobs.scheduler.add_job('_poll_controller_data', func="webapp.jobs:_poll_controller_data",
+                               trigger='interval', seconds=seconds * 2 + 1, minutes=minutes * 2)
 
 
 def job_removed_listener(event):
     """Job removed event."""
-    with jobs.scheduler.app.app_context():
-        _logger.info(f"Scheduled job {event.job_id} removed to job store.")
-        if event.job_id == 'poll_controller_data':
-            # remove companion func
-            jobs.scheduler.remove_job('_poll_controller_data')
+    _logger.info(f"Scheduled job {event.job_id} removed to job store.")
+    if event.job_id == 'poll_controller_data':
+        # remove companion func
+        jobs.scheduler.remove_job('_poll_controller_data')
 
 
 def job_submitted_listener(event):
@@ -1,21 +1,27 @@
 import datetime
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import column_property, deferred
 from webapp.config import DEFAULT_FAN_PWM
 
 
 db = SQLAlchemy()
 
 
+_DEG = "\N{DEGREE SIGN}"
+
+
 class Celsius(int):
+    __slots__ = ()  # no per-instance __dict__
+
     def __new__(cls, value, *args, **kwargs):
         return super(cls, cls).__new__(cls, value)
 
     def __str__(self):
-        return "%d\N{DEGREE SIGN}" % int(self)
+        return f"{int(self)}{_DEG}"
 
     def __repr__(self):
-        return "%d\N{DEGREE SIGN}" % int(self)
+        return f"{int(self)}{_DEG}"
 
 
 class SysConfig(db.Model):
@@ -80,14 +86,14 @@ class Disk(db.Model):
     name = db.Column(db.String, unique=True, nullable=False)
     devname = db.Column(db.String, unique=True)
     model = db.Column(db.String)
-    subsystem = db.Column(db.String)  #
+    subsystem = deferred(db.Column(db.String))  # deferred; not shown in list views
     size = db.Column(db.Integer)  # in bytes
     rotationrate = db.Column(db.Integer)  # rpm
     type = db.Column(db.String)  # HDD, SDD, etc...
     bus = db.Column(db.String)  # SCSI, SATA, etc...
     zfs_pool = db.Column(db.String)  # zfs pool name
-    zfs_topology = db.Column(db.String)  # [data,log,cache,spare,special,dedup]
-    zfs_device_path = db.Column(db.String, unique=True)
+    zfs_topology = deferred(db.Column(db.String))  # [data,log,cache,spare,special,dedup]
+    zfs_device_path = deferred(db.Column(db.String, unique=True))
     read_errors = db.Column(db.Integer, default=0)
     write_errors = db.Column(db.Integer, default=0)
     checksum_errors = db.Column(db.Integer, default=0)
@@ -97,7 +103,8 @@ class Disk(db.Model):
     phy_slot_id = db.Column(db.Integer, db.ForeignKey("phy_slot.id"), unique=True)
     create_date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     modify_date = db.Column(db.DateTime, onupdate=datetime.datetime.utcnow)
-    disk_temps = db.relationship('DiskTemp', back_populates='disk', lazy="selectin")
+    # history grows every temperature poll; only loaded when accessed
+    disk_temps = db.relationship('DiskTemp', back_populates='disk')
     phy_slot = db.relationship('PhySlot', back_populates='disk', uselist=False)
 
     @hybrid_property
@@ -113,22 +120,16 @@ class Disk(db.Model):
         return self.create_date
 
 
-update_disk_temp_trigger = db.DDL("""\
-CREATE TRIGGER update_disk_temp_tr UPDATE OF temp ON disk
-  BEGIN
-    INSERT INTO disk_temp (temp, disk_serial, create_date) 
-    VALUES (NEW.temp, NEW.disk_serial, DATETIME('now'));
-  END;""")
-db.event.listen(Disk.__table__, 'after_create', update_disk_temp_trigger)
-
-
 class DiskTemp(db.Model):
     __tablename__ = "disk_temp"
     id = db.Column(db.Integer, primary_key=True)
     temp = db.Column(db.Integer, nullable=False)
     disk_serial = db.Column(db.String, db.ForeignKey("disk.serial"))
     disk = db.relationship('Disk', back_populates='disk_temps')
-    create_date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    create_date = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+    __table_args__ = (
+        db.Index('ix_disk_temp_serial_date', disk_serial, create_date),
+    )
 
     def __repr__(self):
         return f"{self.temp}"
@@ -169,21 +170,22 @@ class Chassis(db.Model):
             return self.controller.fan_port_cnt
         return 0
 
+    # instance branches below count over the selectin-loaded slots/disks/fans (no extra queries);
+    # the expressions are the equivalent correlated aggregates for sorting and filtering
     @hybrid_property
     def populated_slots(self):
-        return sum([slot.disk is not None for slot in self.phy_slots if slot.chassis_id == self.id])
+        return len(self.disks)
 
     @populated_slots.expression
     def populated_slots(cls):  # noqa
-        return db.select(db.func.count(PhySlot.disk_id)).\
+        return db.select(db.func.count(Disk.serial)).\
+                join(PhySlot, Disk.phy_slot_id == PhySlot.id).\
                 where(PhySlot.chassis_id == cls.id).\
                 label('populated_slots')
 
     @hybrid_property
     def active_fans(self):
-        if self.fans:
-            return sum([fan.active for fan in self.fans])
-        return []
+        return sum(1 for fan in self.fans if fan.active)
 
     @active_fans.expression
     def active_fans(cls):  # noqa
@@ -193,16 +195,16 @@ class Chassis(db.Model):
 
     @hybrid_property
     def avg_disk_temp(self):
-        if self.phy_slots:
-            disks = [slot.disk for slot in self.phy_slots if slot.disk is not None]
-            if disks:
-                return sum([disk.temperature for disk in disks]) / len(disks)
+        temps = [disk.temperature for disk in self.disks if disk.temperature is not None]
+        if temps:
+            return sum(temps) / len(temps)
         return 0
 
     @avg_disk_temp.expression
     def avg_disk_temp(cls):  # noqa
         return db.select(db.func.avg(Disk.temperature)).\
-                where(Disk.chassis_id == cls.id).\
+                join(PhySlot, Disk.phy_slot_id == PhySlot.id).\
+                where(PhySlot.chassis_id == cls.id).\
                 label('avg_disk_temp')
 
     @hybrid_property
@@ -283,7 +285,8 @@ class Fan(db.Model):
     calibration_job_uuid = db.Column(db.String)
     calibration_status = db.Column(db.Integer)
     controller = db.relationship('Controller', back_populates='fans', uselist=False)
-    setpoints = db.relationship('FanSetpoint', back_populates='fan', cascade="all, delete-orphan")
+    setpoints = db.relationship('FanSetpoint', back_populates='fan', cascade="all, delete-orphan",
+                                order_by='FanSetpoint.temp', lazy="selectin")
     logs = db.relationship('FanLog', back_populates='fan', cascade="all, delete-orphan")
     # updates every time the fan RPM is reported
     last_report = db.Column(db.DateTime, default=datetime.datetime.utcnow)
@@ -349,14 +352,25 @@ class FanLog(db.Model):
     old_pwm = db.Column(db.Integer)
     new_pwm = db.Column(db.Integer)
     fan = db.relationship('Fan', back_populates='logs')
-    create_date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    create_date = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
     modify_date = db.Column(db.DateTime, onupdate=datetime.datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_fan_log_fan_date', fan_id, create_date),
+    )
 
     def __repr__(self):
         if self.fan:
             return f"{self.create_date}: PWM: {self.old_pwm} to {self.new_pwm}"
 
 
+# log count as a correlated subquery instead of hydrating the whole Fan.logs collection;
+# deferred so only queries that undefer() it (fan list, chassis grid) pay for the COUNT
+Fan.log_count = column_property(
+    db.select(db.func.count(FanLog.id)).where(FanLog.fan_id == Fan.id).correlate_except(FanLog).scalar_subquery(),
+    deferred=True
+)
+
+
 update_fan_log_trigger = db.DDL("""\
 CREATE TRIGGER update_fan_active_tr UPDATE OF pwm ON fan
   BEGIN
@@ -391,7 +405,7 @@ class Alert(db.Model):
 class ComStat(db.Model):
     __tablename__ = "com_stat"
     id = db.Column(db.Integer, primary_key=True)
-    stat_date = db.Column(db.Date)
+    stat_date = db.Column(db.Date, index=True, unique=True)  # unique index; tty_stat_tracker upserts on it
     rx = db.Column(db.Integer, default=0)
     tx = db.Column(db.Integer, default=0)
     err = db.Column(db.Integer, default=0)
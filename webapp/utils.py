@@ -1,18 +1,23 @@
+import functools
 import logging
-import math
 import os
 import csv
+import threading
 from datetime import datetime, timedelta
 from enum import IntEnum
 from typing import Optional, Iterable, Union
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dateutil import tz
 from flask import Markup, current_app, Flask
 from flask_admin.helpers import url_for
 from flask_admin.model import typefmt
 from flask_admin.model.template import TemplateLinkRowAction
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session, selectinload
 
 from webapp.models import db, FanSetpoint, SysConfig, Disk, Alert, Chassis, PhySlot, Fan
 from webapp import jobs
@@ -26,47 +31,154 @@ class StatusFlag(IntEnum):
     ERROR = 4
 
 
+# SysConfig key -> value; emptied by clear_config_cache whenever a SysConfig row is written
+_config_cache: dict = {}
+# bumped by clear_config_cache; rows read before a clear are not cached
+_config_generation = 0
+_config_lock = threading.Lock()
+_NOT_CACHED = object()
+
+
+def _cache_config_rows(rows: dict, generation: int) -> None:
+    """Caches rows read at generation unless the cache was cleared while they were being read"""
+    with _config_lock:
+        if generation == _config_generation:
+            _config_cache.update(rows)
+
+
 def get_config_value(config_param: str):
-    with current_app.app_context():
-        return db.session.query(SysConfig.value).where(SysConfig.key == config_param).first()[0]
+    """
+    Cached SysConfig value lookup.
+    Runs on the caller's app context (and db session) when one is active.
+    """
+    try:
+        return _config_cache[config_param]
+    except KeyError:
+        pass
+    generation = _config_generation
+    with jobs.maybe_app_context():
+        value = db.session.query(SysConfig.value).where(SysConfig.key == config_param).first()[0]
+    _cache_config_rows({config_param: value}, generation)
+    return value
+
+
+def get_config_values(*config_params: str) -> dict:
+    """
+    Cached lookup of several SysConfig values; uncached keys are read with one query.
+    @return: {key: value}
+    """
+    # the result is built from this call's cache hits and query rows, never read back from the shared cache
+    values = {}
+    for k in config_params:
+        value = _config_cache.get(k, _NOT_CACHED)
+        if value is not _NOT_CACHED:
+            values[k] = value
+    missing = [k for k in config_params if k not in values]
+    if missing:
+        generation = _config_generation
+        with jobs.maybe_app_context():
+            rows = dict(db.session.query(SysConfig.key, SysConfig.value).where(SysConfig.key.in_(missing)).all())
+        _cache_config_rows(rows, generation)
+        values.update(rows)
+    return {k: values[k] for k in config_params}
+
+
+def clear_config_cache(*args):
+    """Drops cached SysConfig derived values"""
+    global _config_generation
+    with _config_lock:
+        _config_cache.clear()
+        _config_generation += 1
+    _truenas_credentials.cache_clear()
+    _fan_alert_window.cache_clear()
+    jobs.truenas_connection_info.cache_clear()
+
+
+def _sys_config_written(mapper, connection, target):
+    """
+    SysConfig mapper event hook (runs at flush). Clears now and flags the session so the cache
+    is cleared again at commit/rollback; another thread may re-cache the old committed value in between.
+    """
+    clear_config_cache()
+    session = object_session(target)
+    if session is not None:
+        session.info['sys_config_written'] = True
+
+
+def _sys_config_session_end(session, *args):
+    """Session after_commit/after_rollback hook"""
+    if session.info.pop('sys_config_written', False):
+        clear_config_cache()
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    db.event.listen(SysConfig, _event, _sys_config_written)
+for _event in ('after_commit', 'after_rollback'):
+    db.event.listen(Session, _event, _sys_config_session_end)
 
 
 def get_alerts():
-    with current_app.app_context():
-        return db.session.query(Alert).all()
+    """Jinja2 function; rendered inside the request's app context"""
+    return db.session.query(Alert).all()
 
 
-def truenas_api_request(method: str, url_path: str, headers: Optional[dict] = None, data: Optional[dict] = None):
-    if headers is None:
-        headers = {}
-    with current_app.app_context():
-        api_key = db.session.execute(
-            db.select(SysConfig).where(SysConfig.key == "truenas_api_key")
-        ).first()
-        base_url = db.session.execute(
-            db.select(SysConfig).where(SysConfig.key == "truenas_url")
-        ).first()
-        if getattr(api_key[0], 'value', None) and getattr(base_url[0], 'value', None):
-            if getattr(api_key[0], 'encrypt'):
-                _api_key = current_app.decrypt(getattr(api_key[0], 'value')).decode()
+@functools.lru_cache(maxsize=1)
+def _truenas_credentials() -> Optional[tuple[str, dict]]:
+    """
+    (base_url, auth headers) read with one query and decrypted once;
+    cleared with clear_config_cache(). The headers dict is shared, don't mutate it.
+    """
+    with jobs.maybe_app_context():
+        rows = {
+            row.key: row for row in db.session.query(SysConfig)
+            .where(SysConfig.key.in_(["truenas_api_key", "truenas_url"]))
+            .all()
+        }
+        api_key, base_url = rows.get("truenas_api_key"), rows.get("truenas_url")
+        if api_key and api_key.value and base_url and base_url.value:
+            if api_key.encrypt:
+                _api_key = current_app.decrypt(api_key.value).decode()
             else:
-                _api_key = getattr(api_key[0], 'value')
-            _base_url = getattr(base_url[0], 'value')
-            _headers = {
-                'Authorization': f"Bearer {_api_key}",
-                'accept': '*/*',
-                **headers
-            }
-            return requests.request(method, f"{_base_url}{url_path}", headers=_headers, json=data,
-                                    timeout=int(get_config_value('http_requests_timeout')))
+                _api_key = api_key.value
+            return base_url.value, {'Authorization': f"Bearer {_api_key}", 'accept': '*/*'}
         return None
 
 
+# shared session keeps the TrueNAS connection alive between polls (no TCP/TLS handshake per request)
+_truenas_session = requests.Session()
+for _prefix in ('https://', 'http://'):
+    _truenas_session.mount(_prefix, HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                                max_retries=Retry(total=2, backoff_factor=0.2)))
+
+
+def truenas_api_request(method: str, url_path: str, headers: Optional[dict] = None, data: Optional[dict] = None):
+    credentials = _truenas_credentials()
+    if credentials:
+        _base_url, _headers = credentials
+        if headers:
+            _headers = {**_headers, **headers}
+        return _truenas_session.request(method, f"{_base_url}{url_path}", headers=_headers, json=data,
+                                        timeout=int(get_config_value('http_requests_timeout')))
+    return None
+
+
 def disk_tooltip_html(model: Optional[Disk]) -> str:
     if model:
         return f"""<div class=disk-tooltip-temp>{model.temperature}</div>
-        <a href="{url_for('disk.details_view', id=model.serial)}" class=disk-tooltip-item>{model.serial}</a>
+        <a href="{_disk_details_url(model.serial)}" class=disk-tooltip-item>{model.serial}</a>
         """
+    return _add_disk_tooltip_html()
+
+
+@functools.lru_cache(maxsize=256)
+def _disk_details_url(serial: str) -> str:
+    """Disk urls only depend on the serial; built once per disk"""
+    return url_for('disk.details_view', id=serial)
+
+
+@functools.lru_cache(maxsize=1)
+def _add_disk_tooltip_html() -> str:
+    """Static; rendered for every empty slot"""
     return f"""
     <a href="{url_for('disk.index_view', flt1_physlot_chassis_name_empty=1)}" class=disk-tooltip-item>Add Disk</a>
     """
@@ -75,8 +187,7 @@ def disk_tooltip_html(model: Optional[Disk]) -> str:
 def fan_tooltip_html(model: Optional[Fan]) -> str:
     if model:
         if model.active:
-            cnt = len(model.logs)
-            filter_txt = 'flt1_fan_fan_id_equals'
+            cnt = model.log_count
             if fan_watchdog(model):
                 # watchdog triggered
                 dt = datetime.utcnow() - model.last_report
@@ -85,33 +196,69 @@ def fan_tooltip_html(model: Optional[Fan]) -> str:
                 time_dif = f'{str(int(hours)) + "h"} {str(int(minutes)) + "m"} {str(int(seconds)) + "s"}'
                 return f"""<h5>Alert!</h5><div><i>Last RPM report</i></div><h6>{time_dif} ago</h6>"""
             return f"""<h5>{model.rpm} RPM</h5>
-            <div><a href="{url_for('fan.details_view', id=model.id)}">View Fan</a></div>
-            <div><a class="list-model-link" href='{url_for("fan/log.index_view")}?{filter_txt}={model.id}'>
+            <div><a href="{_fan_details_url(model.id)}">View Fan</a></div>
+            <div><a class="list-model-link" href='{_fan_logs_url(model.id)}'>
                 View Logs ({cnt})
             </a></div>"""
-    return f"""
+    return _NO_FAN_TOOLTIP_HTML
+
+
+_NO_FAN_TOOLTIP_HTML = """
     <i>No active fan on this port.</i>
     """
 
 
+@functools.lru_cache(maxsize=256)
+def _fan_details_url(fan_id: int) -> str:
+    """Fan urls only depend on the fan id; built once per fan"""
+    return url_for('fan.details_view', id=fan_id)
+
+
+@functools.lru_cache(maxsize=256)
+def _fan_logs_url(fan_id: int) -> str:
+    """Fan log list filtered to one fan"""
+    return f"{_endpoint_url('fan/log.index_view')}?flt1_fan_fan_id_equals={fan_id}"
+
+
+@functools.lru_cache(maxsize=64)
+def _endpoint_url(endpoint: str) -> str:
+    """url_for an endpoint without arguments; row formatters append their own query string"""
+    return url_for(endpoint)
+
+
 def fan_watchdog(model: Fan) -> bool:
     """
     Fan Window Watchdog Timer - Returns bool if fan does not update within set window
     """
-    with current_app.app_context():
-        trigger_dt = model.last_report + timedelta(seconds=int(get_config_value('fan_alert_after_seconds')))
-        if trigger_dt < datetime.utcnow():
-            return True
-        return False
+    trigger_dt = model.last_report + _fan_alert_window()
+    if trigger_dt < datetime.utcnow():
+        return True
+    return False
+
+
+@functools.lru_cache(maxsize=1)
+def _fan_alert_window() -> timedelta:
+    """fan_alert_after_seconds as a timedelta; cleared with clear_config_cache()"""
+    return timedelta(seconds=int(get_config_value('fan_alert_after_seconds')))
+
+
+@functools.lru_cache(maxsize=128)
+def _load_svg(root_path: str, path: str) -> str:
+    """Raw svg file contents; svgs are static assets so they're read once"""
+    with open(os.path.join(root_path, *path.split('/')), 'r') as svg:
+        return svg.read()
+
+
+def clear_svg_cache() -> None:
+    """Drops cached svg contents (dev reloads)"""
+    _load_svg.cache_clear()
 
 
 def svg_html_converter(path: str) -> str:
     """Jinja2 function"""
-    with current_app.app_context():
-        root_path = str(current_app.root_path).split(os.sep)
+    # rendered inside the request's app context; path is only joined on a cache miss
     try:
-        with open('/'.join([*root_path, *path.split('/')]), 'r') as svg:
-            return Markup(svg.read())
+        return Markup(_load_svg(current_app.root_path, path))
     except OSError:
         return ""
 
@@ -121,57 +268,60 @@ def pwm_change_formatter(view, context, model, name):  # noqa
 
 
 def fan_log_formatter(view, context, model, name):  # noqa
-    cnt = len(model.logs)
-    filter_txt = 'flt1_fan_fan_id_equals'
+    cnt = model.log_count
     if cnt > 0:
         return Markup(
-            f"""<a class="list-model-link" href='{url_for("fan/log.index_view")}?{filter_txt}={model.id}'>
+            f"""<a class="list-model-link" href='{_fan_logs_url(model.id)}'>
                 View Logs ({cnt} total)
             </a>"""
         )
 
 
+_SIZE_NAMES = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+
+
 def disk_size_formatter(view, context, model, name):  # noqa
     size_bytes = getattr(model, name)
-    if size_bytes == 0:
+    if not size_bytes:
         return "0B"
-    size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return "%s %s" % (s, size_name[i])
+    # power of 1024 from the bit length; exact for ints, no float log
+    i = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_NAMES) - 1)
+    return f"{round(size_bytes / (1 << (10 * i)), 2)} {_SIZE_NAMES[i]}"
 
 
 def disk_link_formatter(view, context, model, name):  # noqa
     filter_txt = 'flt0_physlot_chassis_name_equals'
     if getattr(model, name):
         return Markup(
-            f"""<a href='{url_for("disk.index_view")}?{filter_txt}={model.name}'>{getattr(model, name)}</a>"""
+            f"""<a href='{_endpoint_url("disk.index_view")}?{filter_txt}={model.name}'>{getattr(model, name)}</a>"""
         )
     return getattr(model, name)
 
 
 def next_job_runtime_formatter(view, context, model, name):  # noqa
     if model.active:
-        job = jobs.scheduler.get_job(getattr(model, 'job_id'))
+        job = jobs.scheduler.get_job(model.job_id)
         if job:
             delta = job.next_run_time.replace(tzinfo=None) - datetime.now()
-            delta_txt = ""
-            if int(delta.days) > 0:
-                return f"{int(delta.days)} Day(s)"
-            if delta.seconds >= 3600:
-                delta_txt += f"{int(delta.seconds / 3600)}h "
-            if int(delta.seconds) > 60:
-                delta_txt += f"{int(delta.seconds / 60)}m "
-            if int(delta.seconds) > 0:
-                delta_txt += f"{(delta.seconds % 60)}s "
-            return delta_txt
+            if delta.days > 0:
+                return f"{delta.days} Day(s)"
+            hours, remainder = divmod(delta.seconds, 3600)
+            minutes, seconds = divmod(remainder, 60)
+            return " ".join(f"{v}{u}" for v, u in ((hours, "h"), (minutes, "m"), (seconds, "s")) if v)
     return None
 
+
+_UTC = tz.gettz('UTC')
+
+
+@functools.lru_cache(maxsize=4)
+def _local_tz(name: str):
+    return tz.gettz(name)
+
+
 def datetime_formatter(view, value, name):  # noqa
-    with current_app.app_context():
-        value = value.replace(tzinfo=tz.gettz('UTC'))
-        return value.astimezone(tz.gettz(current_app.config['TIMEZONE'])).strftime('%m/%d/%Y %X')
+    value = value.replace(tzinfo=_UTC)
+    return value.astimezone(_local_tz(current_app.config['TIMEZONE'])).strftime('%m/%d/%Y %X')
 
 
 def byte_formatter(view, value, name):  # noqa
@@ -182,11 +332,11 @@ def psu_toggle_formatter(view, context, model, name):  # noqa
     # psu off
     if getattr(model, name):
         return Markup(
-            f"""<a href='{url_for("chassis.psu_toggle")}?id={model.id}&state=ON'>TURN-ON</a>"""
+            f"""<a href='{_endpoint_url("chassis.psu_toggle")}?id={model.id}&state=ON'>TURN-ON</a>"""
         )
     # psu on
     return Markup(
-        f"""<a href='{url_for("chassis.psu_toggle")}?id={model.id}&state=OFF'>TURN-OFF</a>"""
+        f"""<a href='{_endpoint_url("chassis.psu_toggle")}?id={model.id}&state=OFF'>TURN-OFF</a>"""
     )
 
 
@@ -246,60 +396,99 @@ def csv_upload_processor(path: str, disk_serials: list, chassis_ids: list) -> di
         'skipped_slot': [],
         'slot_in_use': []
     }
-    _disks = []
+    _disks = set()
+    _missing_chassis = set()
     with open(path, newline='') as csvfile:
         csv_reader = csv.DictReader(csvfile, fieldnames=['chassis', 'disk', 'slot'])
-        for i, row in enumerate(csv_reader):
-            if (i == 0) or (row['disk'] == "" or row['chassis'] == "" or row['slot'] == ""):
-                continue
-            if row['disk'] not in disk_serials:
-                resp_dict['missing_disks'].append(row['disk'])
-                continue
-            if row['disk'] in _disks:
-                resp_dict['duplicated_disks'].append(row['disk'])
-                continue
-            else:
-                _disks.append(row['disk'])
-            disk = db.session.query(Disk).where(Disk.serial == row['disk']).first()
-            if int(row['chassis']) not in chassis_ids:
-                if row['chassis'] not in resp_dict['missing_chassis']:
-                    resp_dict['missing_chassis'].append(row['chassis'])
-                continue
-            chassis = db.session.query(Chassis).where(Chassis.id == row['chassis']).first()
-            if int(row['slot']) > chassis.slot_cnt:
-                resp_dict['skipped_slot'].append(row['slot'])
-                continue
-            physlot = db.session.query(PhySlot) \
-                .where(PhySlot.chassis_id == row['chassis'],
-                       PhySlot.phy_slot == row['slot']) \
-                .first()
+        next(csv_reader, None)  # header row
+        rows = [row for row in csv_reader if row['disk'] and row['chassis'] and row['slot']]
+    # preload everything the rows reference; phy_slots and their disks are selectin loaded with the chassis
+    disks_by_serial = {
+        d.serial: d for d in db.session.query(Disk)
+        .where(Disk.serial.in_({row['disk'] for row in rows if row['disk'] in disk_serials}))
+        .all()
+    }
+    chassis_by_id = {
+        c.id: c for c in db.session.query(Chassis)
+        .options(selectinload(Chassis.phy_slots).selectinload(PhySlot.disk))
+        .where(Chassis.id.in_(chassis_ids))
+        .all()
+    }
+    slots = {(p.chassis_id, p.phy_slot): p for c in chassis_by_id.values() for p in c.phy_slots}
+    # phy_slot id -> serial of the disk in it, kept current as rows are assigned
+    slot_owner = {p.id: p.disk.serial for p in slots.values() if p.disk}
+    assigned = []
+    for row in rows:
+        if row['disk'] not in disk_serials:
+            resp_dict['missing_disks'].append(row['disk'])
+            continue
+        if row['disk'] in _disks:
+            resp_dict['duplicated_disks'].append(row['disk'])
+            continue
+        else:
+            _disks.add(row['disk'])
+        disk = disks_by_serial[row['disk']]
+        if int(row['chassis']) not in chassis_ids:
+            if row['chassis'] not in _missing_chassis:
+                _missing_chassis.add(row['chassis'])
+                resp_dict['missing_chassis'].append(row['chassis'])
+            continue
+        chassis = chassis_by_id[int(row['chassis'])]
+        physlot = slots.get((chassis.id, int(row['slot'])))
+        if int(row['slot']) > chassis.slot_cnt or physlot is None:
+            resp_dict['skipped_slot'].append(row['slot'])
+            continue
+        if slot_owner.get(physlot.id, disk.serial) != disk.serial:
+            resp_dict['slot_in_use'].append(f"{physlot} by {physlot.disk}")
+            continue
+        slot_owner.pop(disk.phy_slot_id, None)
+        slot_owner[physlot.id] = disk.serial
+        disk.phy_slot_id = physlot.id
+        assigned.append((disk, physlot))
+    try:
+        db.session.commit()
+        resp_dict['added_disks'].extend(disk for disk, _ in assigned)
+    except IntegrityError:
+        # flush order can briefly collide slots when disks swap; redo one disk at a time
+        db.session.rollback()
+        for disk, physlot in assigned:
             disk.phy_slot_id = physlot.id
-            resp_dict['added_disks'].append(disk)
             try:
                 db.session.commit()
+                resp_dict['added_disks'].append(disk)
             except IntegrityError:
                 db.session.rollback()
                 resp_dict['slot_in_use'].append(f"{physlot} by {physlot.disk}")
-        return resp_dict
+    return resp_dict
 
 
 def cascade_add_setpoints(fan_id: int):
-    min_chassis_temp = int(get_config_value('min_chassis_temp'))
-    max_chassis_temp = int(get_config_value('max_chassis_temp'))
-    min_fan_pwm = int(get_config_value('min_fan_pwm'))
-    max_fan_pwm = int(get_config_value('max_fan_pwm'))
-    mid_fan_pwm = round((int(min_fan_pwm) + int(max_fan_pwm)) / 2)
+    cfg = get_config_values('min_chassis_temp', 'max_chassis_temp', 'min_fan_pwm', 'max_fan_pwm')
+    min_chassis_temp = int(cfg['min_chassis_temp'])
+    max_chassis_temp = int(cfg['max_chassis_temp'])
+    min_fan_pwm = int(cfg['min_fan_pwm'])
+    max_fan_pwm = int(cfg['max_fan_pwm'])
+    mid_fan_pwm = round((min_fan_pwm + max_fan_pwm) / 2)
     mid_chassis_temp = round((min_chassis_temp + max_chassis_temp) / 2, -1)
-    db.session.add(FanSetpoint(fan_id=fan_id, pwm=int(min_fan_pwm), temp=min_chassis_temp))
-    db.session.add(FanSetpoint(fan_id=fan_id, pwm=mid_fan_pwm, temp=mid_chassis_temp))
-    db.session.add(FanSetpoint(fan_id=fan_id, pwm=int(max_fan_pwm), temp=max_chassis_temp))
+    # single executemany insert for the three default setpoints
+    db.session.execute(insert(FanSetpoint), [
+        {"fan_id": fan_id, "pwm": min_fan_pwm, "temp": min_chassis_temp},
+        {"fan_id": fan_id, "pwm": mid_fan_pwm, "temp": mid_chassis_temp},
+        {"fan_id": fan_id, "pwm": max_fan_pwm, "temp": max_chassis_temp},
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def _non_pk_columns(model_cls) -> tuple:
+    """Column names of a model's table minus its primary key; static per model class"""
+    table = model_cls.__table__
+    pk = set(table.primary_key.columns.keys())
+    return tuple(k for k in table.columns.keys() if k not in pk)
 
 
 def clone_model(model, **kwargs):
     """Clone an arbitrary sqlalchemy model object without its primary key values."""
-    table = model.__table__
-    non_pk_columns = [k for k in table.columns.keys() if k not in table.primary_key.columns.keys()]
-    data = {c: getattr(model, c) for c in non_pk_columns}
+    data = {c: getattr(model, c) for c in _non_pk_columns(model.__class__)}
     data.update(kwargs)
 
     clone = model.__class__(**data)
@@ -308,69 +497,81 @@ def clone_model(model, **kwargs):
     return clone
 
 
+_CONFIG_FORMATTERS = {
+    **typefmt.BASE_FORMATTERS,
+    bytes: byte_formatter,
+    datetime: datetime_formatter
+}
+
+
 def get_config_formatters() -> dict:
-    CONFIG_FORMATTERS = dict(typefmt.BASE_FORMATTERS)
-    CONFIG_FORMATTERS.update({
-        bytes: byte_formatter,
-        datetime: datetime_formatter
-    })
-    return CONFIG_FORMATTERS
+    """Shared formatter map, built once at import; don't mutate it"""
+    return _CONFIG_FORMATTERS
 
 
-def json_path_generator(key: str, val: object, var: object) -> Iterable:
+def json_match_generator(key: str, val: object, var: object, path: tuple = ()) -> Iterable:
     """
-    Generator that returns the path to the provided key/value
-    in a JSON object. Example:
-        list(json_path_generator('key_to_find', 'value_of_key', json))
+    Generator that returns (path, object) for every dict in a JSON object
+    where key == val. Path is a tuple of the keys/indexes walked. Example:
+        list(json_match_generator('key_to_find', 'value_of_key', json))
     @param key: Dict key to find
     @param val: Dict key's value to match
     @param var: JSON object
+    @param path: path of var within the root object
     """
-    if hasattr(var, 'items'):
-        for k, v in var.items():
-            if k == key and v == val:
-                yield k
-            if isinstance(v, dict):
-                for result in json_path_generator(key, val, v):
-                    yield f"{k}.{result}"
-            elif isinstance(v, list):
-                for i, d in enumerate(v):
-                    for result in json_path_generator(key, val, d):
-                        yield f"{k}.{i}.{result}"
-
-
-def resolve_string_attr(obj: object, attr: str, level: int = None) -> Union[list, dict]:
-    """
-    Returns an attribute from the object passed based on the string path specified
-    in the attr.  If level is provided, the object returned will be the Nth level
-    of the attr string path provided.
-    @param obj: object to resolve
-    @param attr: dot (.) separated attribute path string i.e. "path.to.attr"
-    @param level: Return Nth level of attribute path i.e. level=1 "path.to"
-    @return: resolved attribute object
-    """
-    list_attr = attr.strip(".").split(".")[:-1 if not level else level]
-    for i, name in enumerate(list_attr):
-        if name.isdigit():
-            obj = obj[int(name)]
+    stack = [(path, var)]
+    while stack:
+        path, node = stack.pop()
+        if isinstance(node, dict):
+            if node.get(key) == val:
+                yield path, node
+            children = [((*path, k), v) for k, v in node.items() if isinstance(v, (dict, list))]
+        elif isinstance(node, list):
+            children = [((*path, i), d) for i, d in enumerate(node)]
         else:
-            obj = obj.get(name)
-    return obj
+            continue
+        # reversed so matches come out in document order
+        stack.extend(reversed(children))
 
 
 class AlertLogHandler(logging.Handler):
+    """
+    Writes log records to the alert table in batches.
+    Meant to run behind a QueueListener; records are buffered while more are waiting in
+    alert_queue and written with one insert/commit once it drains or max_batch is reached.
+    """
 
-    def __init__(self, alert_model, app_context: Flask, db_session):
+    def __init__(self, alert_model, app_context: Flask, db_session, alert_queue=None, max_batch: int = 50):
         logging.Handler.__init__(self)
         self.app_context = app_context
         self.db_session = db_session
         self.alert_model = alert_model
+        self.alert_queue = alert_queue
+        self.max_batch = max_batch
         self.log_msg = None
+        self._buffer = []
 
     def emit(self, record):
-        # Clear the log message so that it can be put to db via sql (escape quotes)
-        self.log_msg = record.msg.strip().replace('\'', '\'\'')
-        # Make the SQL insert
-        with self.app_context.app_context():
-            self.db_session.add(self.alert_model(category=record.levelname, content=self.log_msg))
-            self.db_session.commit()
+        # bound as a parameter by the insert; no quote escaping needed
+        self.log_msg = str(record.msg).strip()
+        self._buffer.append({"category": record.levelname, "content": self.log_msg})
+        if len(self._buffer) >= self.max_batch or self.alert_queue is None or self.alert_queue.empty():
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        self.acquire()
+        try:
+            rows, self._buffer = self._buffer, []
+            # Make the SQL insert
+            with self.app_context.app_context():
+                self.db_session.execute(insert(self.alert_model), rows)
+                self.db_session.commit()
+        finally:
+            self.release()
+
+    def close(self):
+        # write whatever is still buffered before the handler goes away
+        self.flush()
+        logging.Handler.close(self)
@@ -1,6 +1,7 @@
 import datetime
 import os
 import uuid
+from functools import cached_property
 
 import serial
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
@@ -12,13 +13,15 @@ from flask_admin.model.template import LinkRowAction
 from requests.exceptions import MissingSchema
 from serial.tools.list_ports import comports
 from wtforms.widgets import PasswordInput
+from sqlalchemy import delete, insert, update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import lazyload, selectinload, undefer
 
 from webapp import utils, config
 from webapp.console import JBODConsoleException
 from webapp.jobs import scheduler, query_disk_properties, query_controller_properties, \
     truenas_connection_info, get_console, ping_controllers, console_connection_check, activate_sys_job, \
-    deactivate_sys_job
+    deactivate_sys_job, invalidate_console
 from webapp.jobs.events import fan_calibration_job_listener
 from webapp.models import db, PhySlot, FanSetpoint, Fan, Controller, SysConfig, Chassis, \
     SysJob, Alert, Disk, ComStat
@@ -37,8 +40,13 @@ class JBODBaseView(ModelView):
             excluded_columns=self.column_exclude_list,
         )
 
+    @cached_property
+    def _editable_columns(self) -> frozenset:
+        """column_editable_list as a set; views are long-lived so it's built once"""
+        return frozenset(self.column_editable_list or ())
+
     def is_editable_row(self, row, name):
-        return name in self.column_editable_list and self.can_edit
+        return name in self._editable_columns and self.can_edit
 
 
 class IndexView(BaseView):
@@ -72,7 +80,12 @@ class IndexView(BaseView):
                     'day': stats.rx if stats else tty.bytes_recv,
                 }
             }
-        jbods = db.session.query(Chassis).where(Chassis.controller_id is not None).all()  # noqa
+        # grid shows every slot's disk and every fan; each level is loaded with one IN query
+        jbods = db.session.query(Chassis) \
+            .options(selectinload(Chassis.phy_slots).selectinload(PhySlot.disk),
+                     selectinload(Chassis.controller).selectinload(Controller.fans)
+                     .options(lazyload(Fan.setpoints), undefer(Fan.log_count))) \
+            .where(Chassis.controller_id is not None).all()  # noqa
         sys_scheduler = {
             'running': scheduler.running,
             'active_jobs': len(scheduler.get_jobs()),
@@ -105,8 +118,10 @@ class NewSetupView(BaseView):
         """
         if request.method == 'POST':
             content = request.get_json(force=True)
+            # all posted keys in one query
+            models = {m.key: m for m in db.session.query(SysConfig).where(SysConfig.key.in_(list(content))).all()}
             for k, v in content.items():
-                model = db.session.query(SysConfig).where(SysConfig.key == k).first()
+                model = models[k]
                 model.value = v if not model.encrypt else current_app.encrypt(v.encode())
             db.session.commit()
             return jsonify({"result": "success", "msg": "Connection successful."}), 200
@@ -119,8 +134,10 @@ class NewSetupView(BaseView):
         """
         if request.method == 'POST':
             content = request.get_json(force=True)
+            # all posted keys in one query
+            models = {m.key: m for m in db.session.query(SysConfig).where(SysConfig.key.in_(list(content))).all()}
             for k, v in content.items():
-                model = db.session.query(SysConfig).where(SysConfig.key == k).first()
+                model = models[k]
                 # handle changes to serial port and baudrate
                 if k in ['console_port', 'baud_rate']:
                     tty = get_console()
@@ -134,6 +151,7 @@ class NewSetupView(BaseView):
                             except serial.SerialException:
                                 model.value = None
                                 db.session.commit()
+                                invalidate_console()  # port is closed; rebuilt from config on next use
                                 return jsonify({
                                     "result": "error",
                                     "msg": "Error occurred while attempting to change serial port. Please check"
@@ -212,6 +230,10 @@ class FanView(JBODBaseView):
     column_formatters = {'logs': utils.fan_log_formatter}
     column_extra_row_actions = [utils.EditSetpointsRowAction(), utils.FanCalibrationRowAction()]
 
+    def get_query(self):
+        # the logs column shows Fan.log_count; load it with the rows
+        return super().get_query().options(undefer(Fan.log_count))
+
     def on_model_change(self, form, model, is_created):
         if not is_created and form.__contains__('pwm'):
             tty = get_console()
@@ -293,19 +315,22 @@ class FanView(JBODBaseView):
         """
         if request.method == 'POST':
             content = request.get_json(force=True)
-            for sp in content:
-                try:
-                    existing_model = db.session.query(FanSetpoint) \
-                        .where(FanSetpoint.temp == sp['temp'], FanSetpoint.fan_id == sp['fan_id']) \
-                        .first()
-                    if not existing_model:
-                        spm = FanSetpoint(**sp)
-                        db.session.add(spm)
-                    elif sp['pwm'] != existing_model.pwm:
-                        existing_model.pwm = sp['pwm']
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+            existing = self._existing_setpoints(content)
+            try:
+                for sp in content:
+                    self._apply_setpoint(sp, existing)
+                db.session.commit()
+            except IntegrityError:
+                # a posted setpoint collides (e.g. pwm moved between temps); redo one at a time, skipping conflicts
+                db.session.rollback()
+                existing = self._existing_setpoints(content)
+                for sp in content:
+                    try:
+                        self._apply_setpoint(sp, existing)
+                        db.session.commit()
+                    except IntegrityError:
+                        db.session.rollback()
+                        existing = self._existing_setpoints(content)
             return jsonify({"result": "success"}), 200
         fid = request.args.get('fan_id')
         if not fid:
@@ -320,6 +345,25 @@ class FanView(JBODBaseView):
             resp['temp'].append(sp.temp)
         return jsonify(resp)
 
+    @staticmethod
+    def _existing_setpoints(content: list) -> dict:
+        """(temp, fan_id) -> FanSetpoint for every fan in the posted setpoints, loaded with one query"""
+        return {
+            (sp.temp, sp.fan_id): sp for sp in db.session.query(FanSetpoint)
+            .where(FanSetpoint.fan_id.in_({int(sp['fan_id']) for sp in content}))
+            .all()
+        }
+
+    @staticmethod
+    def _apply_setpoint(sp: dict, existing: dict) -> None:
+        key = (int(sp['temp']), int(sp['fan_id']))
+        existing_model = existing.get(key)
+        if not existing_model:
+            existing[key] = FanSetpoint(**sp)
+            db.session.add(existing[key])
+        elif sp['pwm'] != existing_model.pwm:
+            existing_model.pwm = sp['pwm']
+
 
 class SetpointView(JBODBaseView):
     form_excluded_columns = JBODBaseView.form_excluded_columns + ['fan', 'pwm']
@@ -484,6 +528,12 @@ class ChassisView(JBODBaseView):
         'psu_on': 'PSU'
     }
 
+    def get_query(self):
+        # populated_slots/active_fans are read through the instance hybrids; load slots, disks and fans in batches
+        return super().get_query() \
+            .options(selectinload(Chassis.phy_slots).selectinload(PhySlot.disk),
+                     selectinload(Chassis.controller).selectinload(Controller.fans).lazyload(Fan.setpoints))
+
     def get_empty_list_message(self):
         return Markup(f"<a href={self.get_url('.create_view')}>Add a New Chassis</a>")
 
@@ -540,22 +590,26 @@ class ChassisView(JBODBaseView):
 
     def after_model_change(self, form, model, is_created):
         if is_created:
-            for i in range(model.slot_cnt):
-                db.session.add(PhySlot(chassis_id=model.id, phy_slot=i + 1))
-            db.session.commit()
+            db_slots = 0
         else:
-            del_rows = []
             db_slots = db.session.query(db.func.count(PhySlot.id)).where(PhySlot.chassis_id == model.id).first()[0]
-            if db_slots < model.slot_cnt:
-                for i in range(db_slots, model.slot_cnt):
-                    db.session.add(PhySlot(chassis_id=model.id, phy_slot=i))
-            elif db_slots > model.slot_cnt:
-                del_rows += db.session.query(PhySlot) \
-                    .filter(PhySlot.phy_slot > model.slot_cnt, PhySlot.chassis_id == model.id) \
-                    .all()
-            for row in del_rows:
-                db.session.delete(row)
-            db.session.commit()
+        if db_slots < model.slot_cnt:
+            # one executemany insert for the new slots
+            db.session.execute(insert(PhySlot), [
+                {"chassis_id": model.id, "phy_slot": i + 1} for i in range(db_slots, model.slot_cnt)
+            ])
+        elif db_slots > model.slot_cnt:
+            removed = db.select(PhySlot.id).where(PhySlot.chassis_id == model.id, PhySlot.phy_slot > model.slot_cnt)
+            # unassign disks first; the orm delete used to null these out
+            db.session.execute(
+                update(Disk).where(Disk.phy_slot_id.in_(removed)).values(phy_slot_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                delete(PhySlot).where(PhySlot.chassis_id == model.id, PhySlot.phy_slot > model.slot_cnt)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
 
 
 class PhySlotView(JBODBaseView):
@@ -686,17 +740,17 @@ class ControllerView(JBODBaseView):
         new_c = set(r_ids).difference(set(db_ids))
         dead_c = set(db_ids).difference(set(r_ids))
         ack_c = set(db_ids).intersection(set(r_ids))
-        # update existing alive controllers
-        for alive_id in ack_c:
-            ca = utils.get_model_by_id(Controller, alive_id)
-            ca.alive = True
-        # update dead controllers
-        for old_id in dead_c:
-            cd = utils.get_model_by_id(Controller, old_id)
-            if request.args.get('action') == 'delete':
-                db.session.delete(cd)
-            else:
-                cd.alive = False
+        # update the controllers already loaded above; no per-id lookups
+        for c in controllers:
+            if c.id in ack_c:
+                # update existing alive controllers
+                c.alive = True
+            elif c.id in dead_c:
+                # update dead controllers
+                if request.args.get('action') == 'delete':
+                    db.session.delete(c)
+                else:
+                    c.alive = False
         db.session.commit()
         if request.args.get('action') == 'add':
             new_models = []
@@ -764,11 +818,15 @@ class TaskView(JBODBaseView):
     column_extra_row_actions = [utils.RunJobRowAction()]
     column_labels = {'consecutive_failures': 'Failures'}
 
+    @cached_property
+    def _locked_editable_columns(self) -> frozenset:
+        """Editable columns for rows the user can't reschedule"""
+        return self._editable_columns - frozenset(self.conditional_edit_columns)
+
     def is_editable_row(self, row, name):
         if not row.can_edit:
-            _column_editable_list = list(set(self.column_editable_list) - set(self.conditional_edit_columns))
-            return name in _column_editable_list and self.can_edit
-        return name in self.column_editable_list and self.can_edit
+            return name in self._locked_editable_columns and self.can_edit
+        return name in self._editable_columns and self.can_edit
 
     def on_model_change(self, form, model, is_created):
         job = scheduler.get_job(model.job_id)